@@ -9,6 +9,11 @@
 const size_t buff_size = 8;
 int sensor_buff[buff_size] = {};
 
+// binary mode, switched on with the serial command 'b' and off with 'a':
+bool binary_mode = false;
+// numbers the binary frames, so the receiver can count lost frames:
+uint16_t frame_counter = 0;
+
 
 // arduino initialisation here
 void setup() {
@@ -63,8 +68,47 @@ void my_print(int* buffer, size_t buff_size){
 }
 
 
+/*
+ * crc8 with polynomial 0x07 and initial value 0
+ */
+uint8_t crc8(const uint8_t* data, size_t len) {
+  uint8_t crc = 0;
+  for (size_t i = 0; i < len; i++) {
+    crc ^= data[i];
+    for (int bit = 0; bit < 8; bit++) {
+      crc = (crc & 0x80) ? (crc << 1) ^ 0x07 : crc << 1;
+    }
+  }
+  return crc;
+}
+
+/*
+ * send values from buffer as binary frame (little endian):
+ * sync word 0xA5 0x5A | counter uint16 | n uint8 | n samples uint16 | crc8
+ * the crc8 covers counter, n and samples
+ */
+void my_write_binary(int* buffer, size_t buff_size) {
+  uint8_t frame[5 + 2 * buff_size + 1];
+  frame[0] = 0xA5;
+  frame[1] = 0x5A;
+  frame[2] = frame_counter & 0xFF;
+  frame[3] = frame_counter >> 8;
+  frame[4] = buff_size;
+  for (size_t i = 0; i < buff_size; i++) {
+    frame[5 + 2 * i] = buffer[i] & 0xFF;
+    frame[6 + 2 * i] = buffer[i] >> 8;
+  }
+  frame[sizeof(frame) - 1] = crc8(frame + 2, sizeof(frame) - 3);
+  Serial.write(frame, sizeof(frame));
+  // wait till all data is written:
+  Serial.flush();
+  frame_counter++;
+}
+
 
 // send 0-7 --> address pin 0-7 on Mux
+// send b --> binary frames, send a --> csv lines
+// called by loop before each frame, so the host can switch the mode
 void read_serial_command() {
   if (Serial.available() > 0) {
     char received_byte = Serial.read();
@@ -79,8 +123,15 @@ void read_serial_command() {
       case '7':
         addressing_mux(received_byte);
         break;
+      case 'b':
+        binary_mode = true;
+        break;
+      case 'a':
+        binary_mode = false;
+        break;
       default:
-        Serial.println("No command linkend to: " + String(received_byte));
+        // unknown bytes (e.g. the CR/LF of a serial monitor) are ignored,
+        // an answer would end up in the middle of the csv lines or frames:
         break;
     }
   }
@@ -90,6 +141,11 @@ void read_serial_command() {
  * continously read sensor values and send them over serial connection
  */
 void loop() {
+  read_serial_command();
   switch_through_mux(buff_size, 20, sensor_buff);
-  my_print(sensor_buff, buff_size);
+  if (binary_mode) {
+    my_write_binary(sensor_buff, buff_size);
+  } else {
+    my_print(sensor_buff, buff_size);
+  }
 }
@@ -11,7 +11,12 @@ uniform int hasTexture;
 void main()
 {
   if (hasTexture == 1)
+  {
     fragColor = texture(texture1, texCoord);
+    // e.g. around the glyphs of an Atlas, must not hide what is behind:
+    if (fragColor.a == 0.0)
+      discard;
+  }
   else
     fragColor = vec4(0, 0, 0, 1);
 }
@@ -0,0 +1,17 @@
+#version 330 core
+layout(location = 0) in vec3 aPos;
+
+// must be at least BarPlot.maxBars:
+const int MAX_BARS = 128;
+
+// the heights of all bars, written once per frame:
+uniform float heights[MAX_BARS];
+
+void main()
+{
+  // the bottom vertices have z = 0, the top vertices of bar i have
+  // z = i + 1 and are moved up by the height of their bar:
+  int bar = int(aPos.z + 0.5) - 1;
+  float height = bar >= 0 ? heights[bar] : 0.0;
+  gl_Position = vec4(aPos.x, aPos.y + height, 0.0, 1.0);
+}
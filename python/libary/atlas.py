@@ -0,0 +1,155 @@
+from OpenGL.GL import *
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+from textures import cache, upload
+
+# the characters of the glyph atlas if no others are given (printable ASCII):
+CHARACTERS = "".join(chr(i) for i in range(32, 127))
+
+
+class Atlas(object):
+    """
+    Packs images and the glyphs of a font into one RGBA texture, so all
+    labels and all text can be drawn with one texture (see HUD)!
+
+    images maps an image name to its region (s0, t0, s1, t1) in the texture,
+    glyphs maps a character to (region, bbox, advance) where bbox is the
+    (x0, y0, x1, y1) pixel box of the glyph relative to the top left of the
+    line and advance the pixels to the next character, lineHeight is the
+    height of a line in pixels.
+
+    The glyphs are drawn in textColor with their coverage as alpha, for a
+    font file (e.g: "DejaVuSans.ttf") use font, otherwise Pillow's default
+    font is used!
+    """
+    def __init__(self, imgNames=(), font=None, fontSize=32, characters=CHARACTERS,
+                 textColor=(0, 0, 0), padding=4, maxSize=4096):
+        if font is None:
+            try:
+                font = ImageFont.load_default(fontSize)
+            except TypeError:
+                # Pillow < 10.1 only has a small bitmap font without a size:
+                font = ImageFont.load_default()
+        else:
+            font = ImageFont.truetype(font, fontSize)
+        ascent, descent = font.getmetrics()
+        self.lineHeight = ascent + descent
+
+        # everything which gets packed, as (key, RGBA image):
+        items = []
+        for imgName in imgNames:
+            # decoded once, e.g. in the background (see TextureCache.preload):
+            img = Image.fromarray(cache.pixels(imgName)).convert("RGBA")
+            items.append((("image", imgName), img))
+
+        self.glyphs = {}
+        glyphBoxes = {}
+        for character in characters:
+            bbox = font.getbbox(character)
+            advance = font.getlength(character)
+            if bbox[2] <= bbox[0] or bbox[3] <= bbox[1]:
+                # e.g. the space, nothing to draw:
+                self.glyphs[character] = (None, bbox, advance)
+                continue
+            coverage = Image.new("L", (bbox[2] - bbox[0], bbox[3] - bbox[1]), 0)
+            ImageDraw.Draw(coverage).text((-bbox[0], -bbox[1]), character, font=font, fill=255)
+            img = Image.new("RGBA", coverage.size, tuple(textColor) + (0,))
+            img.putalpha(coverage)
+            items.append((("glyph", character), img))
+            glyphBoxes[character] = (bbox, advance)
+
+        width, height, places = Atlas.pack([img.size for _, img in items], padding, maxSize)
+
+        atlas = Image.new("RGBA", (width, height), (0, 0, 0, 0))
+        self.images = {}
+        # the edges of each image are repeated into half of the padding, so
+        # the smaller mipmap levels don't mix the image with its surrounding:
+        border = padding // 2
+        for ((kind, key), img), (x, y) in zip(items, places):
+            extruded = np.pad(np.asarray(img), ((border, border), (border, border), (0, 0)), mode="edge")
+            atlas.paste(Image.fromarray(extruded), (x - border, y - border))
+            # OpenGL's t axis goes up, the image's y axis down:
+            region = (x / width, 1 - (y + img.size[1]) / height,
+                      (x + img.size[0]) / width, 1 - y / height)
+            if kind == "image":
+                self.images[key] = region
+            else:
+                self.glyphs[key] = (region,) + glyphBoxes[key]
+
+        self.width = width
+        self.height = height
+        # neighbouring regions must not bleed into each other:
+        self.textureID = upload(np.asarray(atlas), GL_CLAMP_TO_EDGE)
+
+    def pack(sizes, padding, maxSize):
+        """
+        Class Method!
+        Shelf packing: the rectangles are sorted by height and placed left
+        to right in rows (shelves), if the shelves get higher than the atlas
+        is wide the width is doubled.
+        --------------------------------------------------------------------
+        Returns the width and height of the atlas and the top left corner
+        of each rectangle (in the order of sizes)!
+        """
+        order = sorted(range(len(sizes)), key=lambda i: -sizes[i][1])
+        width = 256
+        while True:
+            places = [None] * len(sizes)
+            x, y, shelfHeight = padding, padding, 0
+            for i in order:
+                w, h = sizes[i]
+                if x + w + padding > width:
+                    x, y, shelfHeight = padding, y + shelfHeight + padding, 0
+                places[i] = (x, y)
+                x += w + padding
+                shelfHeight = max(shelfHeight, h)
+            height = y + shelfHeight + padding
+            fits = all(w + 2 * padding <= width for w, _ in sizes)
+            if fits and height <= width:
+                return width, height, places
+            if width >= maxSize:
+                raise ValueError(f"The images don't fit into a {maxSize}x{maxSize} atlas!")
+            width *= 2
+
+    def layoutText(self, text, height, aspect=1.0):
+        """
+        Lays out text as one line of the given height (in OpenGL's screen
+        coordinates) centered at (0 | 0), characters which aren't in the
+        atlas are skipped. aspect is the windows height / width, so the text
+        isn't stretched on a wide window.
+        --------------------------------------------------------------------
+        Returns the corners (n, 4, 2) and the texture coordinates (n, 4, 2)
+        of the n quads and the width of the text!
+        """
+        scaleY = height / self.lineHeight
+        scaleX = scaleY * aspect
+        boxes, regions = [], []
+        pen = 0
+        for character in text:
+            if character not in self.glyphs:
+                continue
+            region, bbox, advance = self.glyphs[character]
+            if region is not None:
+                boxes.append((pen + bbox[0], bbox[1], pen + bbox[2], bbox[3]))
+                regions.append(region)
+            pen += advance
+        width = pen * scaleX
+        if not boxes:
+            return np.empty((0, 4, 2), np.float32), np.empty((0, 4, 2), np.float32), width
+        boxes = np.array(boxes, dtype=np.float32)
+        x0 = boxes[:, 0] * scaleX - width / 2
+        x1 = boxes[:, 2] * scaleX - width / 2
+        # the pixel boxes go down from the top of the line:
+        y0 = height / 2 - boxes[:, 3] * scaleY
+        y1 = height / 2 - boxes[:, 1] * scaleY
+        return Atlas.corners(x0, y0, x1, y1), Atlas.corners(*np.array(regions, np.float32).T), width
+
+    def corners(x0, y0, x1, y1):
+        """
+        Class Method!
+        Returns the 4 corners of each rectangle in the vertex order of a
+        Label: lower left, lower right, upper left, upper right!
+        """
+        return np.stack([np.stack([x0, y0], 1), np.stack([x1, y0], 1),
+                         np.stack([x0, y1], 1), np.stack([x1, y1], 1)], 1).astype(np.float32)
@@ -0,0 +1,93 @@
+from collections import deque
+from threading import Condition
+
+# what push does when the channel is full:
+BLOCK = "block"              # wait till the consumer made room
+DROP_OLDEST = "drop_oldest"  # throw away the oldest item
+LATEST = "latest"            # keep only the newest item (capacity is 1)
+
+
+class Channel(object):
+    """
+    Bounded buffer to pass items (e.g. sensor frames) from one producer
+    thread to one consumer thread, the memory and therefore the latency
+    stays bounded however much faster the producer is.
+    Every push increments version, so a consumer can check cheaply (without
+    taking the lock) if something new arrived: channel.version != seen_version
+    """
+    def __init__(self, capacity=64, policy=DROP_OLDEST):
+        if policy not in (BLOCK, DROP_OLDEST, LATEST):
+            raise ValueError(f"unknown policy: {policy}")
+        self.policy = policy
+        self.capacity = 1 if policy == LATEST else capacity
+        self.items = deque()
+        self.condition = Condition()
+        self.version = 0
+        self.dropped = 0
+        self.closed = False
+
+    def __len__(self):
+        return len(self.items)
+
+    def push(self, item, timeout=None):
+        """
+        Adds item, if the channel is full it depends on the policy: with BLOCK
+        we wait for at most timeout seconds (forever if None), otherwise
+        the oldest item is dropped!
+        --------------------------------------------------------------------
+        Returns True if item was added, False if we waited in vain or the
+        channel is closed!
+        """
+        with self.condition:
+            # a closed channel keeps its items for the consumer:
+            if self.closed:
+                return False
+            if self.policy == BLOCK:
+                if not self.condition.wait_for(
+                        lambda: len(self.items) < self.capacity or self.closed, timeout):
+                    return False
+                if self.closed:
+                    return False
+            elif len(self.items) >= self.capacity:
+                self.items.popleft()
+                self.dropped += 1
+            self.items.append(item)
+            self.version += 1
+            self.condition.notify_all()
+            return True
+
+    def pop(self, timeout=0):
+        """
+        Removes and returns the oldest item, waits for at most timeout seconds
+        (forever if None) if the channel is empty, then None is returned!
+        """
+        with self.condition:
+            if not self.condition.wait_for(lambda: self.items or self.closed, timeout):
+                return None
+            if not self.items:
+                return None
+            item = self.items.popleft()
+            self.condition.notify_all()
+            return item
+
+    def drain(self):
+        """Removes and returns all pending items as list (oldest first) in one call"""
+        with self.condition:
+            items = list(self.items)
+            self.items.clear()
+            self.condition.notify_all()
+            return items
+
+    def peek(self):
+        """
+        Returns the version and the newest item without removing it, the
+        item is None if the channel is empty!
+        """
+        with self.condition:
+            return self.version, (self.items[-1] if self.items else None)
+
+    def close(self):
+        """Wakes up all waiting threads, nothing can be pushed afterwards"""
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
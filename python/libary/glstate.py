@@ -0,0 +1,58 @@
+from OpenGL.GL import *
+
+
+class GLState(object):
+    """
+    Remembers which program, vertex array and textures are bound, so
+    redundant glUseProgram/glBindVertexArray/glBindTexture calls (each one
+    goes through PyOpenGL's slow wrappers) are skipped, the counters show
+    how many calls were made and how many were avoided.
+    Only works if all binds go through this class, after binding something
+    directly call invalidate!
+    """
+    def __init__(self):
+        self.program = None
+        self.vertexArray = None
+        self.textures = {}
+        self.calls = 0
+        self.skipped = 0
+
+    def useProgram(self, program):
+        if program == self.program:
+            self.skipped += 1
+            return
+        glUseProgram(program)
+        self.program = program
+        self.calls += 1
+
+    def bindVertexArray(self, vertexArray):
+        if vertexArray == self.vertexArray:
+            self.skipped += 1
+            return
+        glBindVertexArray(vertexArray)
+        self.vertexArray = vertexArray
+        self.calls += 1
+
+    def bindTexture(self, target, texture):
+        if self.textures.get(target) == texture:
+            self.skipped += 1
+            return
+        glBindTexture(target, texture)
+        self.textures[target] = texture
+        self.calls += 1
+
+    def invalidate(self):
+        """Forget everything, the next binds are made in any case"""
+        self.program = None
+        self.vertexArray = None
+        self.textures.clear()
+
+    def resetCounters(self):
+        counters = {"bindCalls": self.calls, "bindsSkipped": self.skipped}
+        self.calls = 0
+        self.skipped = 0
+        return counters
+
+
+# there is one OpenGL context, so one state for all shaders and meshes:
+state = GLState()
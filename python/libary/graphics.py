@@ -12,6 +12,9 @@ from OpenGL.GL import *
 """-----------Custom imports------------"""
 from mesh import Mesh
 from shader import Shader
+from glstate import state
+from atlas import Atlas
+from profiler import FrameProfiler
 from camera import Camera
 from utils import fullpath
 
@@ -22,7 +25,10 @@ class Renderer(object):
     shaderPC - Mesh with position and color attributes
     shaderPT - Mesh with position and texture
     shaderPCT - Mesh with position, color and texture
+    shaderPCSkin - like shaderPC but bends the SoftRobot on the GPU
     GUIshader - Mesh with position and (optional)texture, but without matrices!
+    GUIshaderBar - like GUIshader but moves the top vertices of bars up by
+                   their heights (see BarPlot)
 
     The GUIshader doesn't use model, view or projection matrix, so positions
     should be in range [-1, 1] for x and y, e.g. upper right corner of the
@@ -70,10 +76,31 @@ class Renderer(object):
         # for drawing position, color and texture - data
         self.shaderPCT = shader
 
+        shader = Shader(fullpath("shaderPCSkin.vs"), fullpath("shaderPC.fs"))
+        shader.use()
+        shader.setMatrix("view", view)
+        shader.setMatrix("projection", projection)
+        shader.setMatrix("model", model)
+        # for drawing position and color - data of a bending SoftRobot
+        self.shaderPCSkin = shader
+
         shader = Shader(fullpath("GUIshader.vs"), fullpath("GUIshader.fs"))
         # for drawing GUI elements
         self.GUIshader = shader
 
+        shader = Shader(fullpath("GUIshaderBar.vs"), fullpath("GUIshader.fs"))
+        # for drawing all bars of a BarPlot at once
+        self.GUIshaderBar = shader
+
+        # uniforms which are set for every draw with the shader type unless
+        # other values are given, so no draw depends on the one before:
+        self.defaultUniforms = {"PC": {"useOverrideColor": 0},
+                                "PCSkin": {"useOverrideColor": 0},
+                                "GUI": {"hasTexture": 0}}
+        # draws waiting to be sorted, None if we draw immediately:
+        self.queue = None
+        self.programSwitches = 0
+
     def selectShader(self, type):
         if type == "PC":
             return self.shaderPC
@@ -81,13 +108,70 @@ class Renderer(object):
             return self.shaderPT
         elif type == "PCT":
             return self.shaderPCT
+        elif type == "PCSkin":
+            return self.shaderPCSkin
         elif type == "GUI":
             return self.GUIshader
+        elif type == "GUIBar":
+            return self.GUIshaderBar
 
-    def render(self, obj, type):
+    def render(self, obj, type, uniforms=None, draw=None):
+        """
+        Draws obj (calls obj.draw() or draw if given) with the shader of the
+        given type after setting the uniforms, e.g: {"hasTexture": 1},
+        if the render queue is used (see beginQueue) the draw happens later!
+        """
+        if self.queue is not None:
+            mesh = getattr(obj, "mesh", None)
+            texture = getattr(mesh, "textureID", 0)
+            self.queue.append((type, texture, len(self.queue), obj, uniforms, draw))
+            return
+        self.draw(obj, type, uniforms, draw)
+
+    def draw(self, obj, type, uniforms=None, draw=None):
         shader = self.selectShader(type)
+        if state.program != shader.id:
+            self.programSwitches += 1
         shader.use()
-        obj.draw()
+        for name, value in self.defaultUniforms.get(type, {}).items():
+            if not uniforms or name not in uniforms:
+                shader.set(name, value)
+        if uniforms:
+            for name, value in uniforms.items():
+                shader.set(name, value)
+        if draw:
+            draw()
+        else:
+            obj.draw()
+
+    def beginQueue(self):
+        """
+        From now on render only collects the draws, flushQueue draws them
+        sorted by shader and texture so each program and texture is bound
+        only once (the order of draws with the same shader and texture stays).
+        Only for objects whose drawing order doesn't matter!
+        """
+        self.queue = []
+
+    def flushQueue(self, keepQueueing=True):
+        """Draws all collected draws sorted by shader type and texture"""
+        if self.queue is None:
+            return
+        queue = sorted(self.queue, key=lambda entry: entry[:3])
+        self.queue = [] if keepQueueing else None
+        for type, texture, _, obj, uniforms, draw in queue:
+            self.draw(obj, type, uniforms, draw)
+
+    def getCounters(self):
+        """
+        Returns the counters of avoided GL calls (redundant binds and
+        uniform writes) and of program switches since the last call!
+        """
+        counters = state.resetCounters()
+        counters.update(Shader.resetCounters())
+        counters["programSwitches"] = self.programSwitches
+        self.programSwitches = 0
+        return counters
 
     def updateModelMatrix(self, model, type):
         shader = self.selectShader(type)
@@ -106,20 +190,40 @@ class Renderer(object):
 
 
 class Window(object):
-    def __init__(self, width=0, height=0):
-        pygame.init()
-        if width !=0 and height != 0:
-            pygame.display.set_mode((width, height), flags=DOUBLEBUF|OPENGL)
+    def __init__(self, width=0, height=0, headless=False):
+        """
+        With headless=True no display is needed: everything is rendered
+        into an offscreen framebuffer (see offscreen.py, which must be
+        imported before this module), the input comes from postEvents and
+        the frames can be read with readFrame, e.g. to run benchmarks or
+        tests on a server without GPU (see runScript)!
+        """
+        self.headless = headless
+        if headless:
+            from offscreen import OffscreenContext
+            width = width or 640
+            height = height or 480
+            self.context = OffscreenContext(width, height)
         else:
-            pygame.display.set_mode((0, 0), flags=DOUBLEBUF|OPENGL|FULLSCREEN)
-            width = pygame.display.Info().current_w
-            height = pygame.display.Info().current_h
-
-        pygame.mouse.set_pos([width/2, height/2])
-        pygame.mouse.set_visible(False)
+            pygame.init()
+            if width !=0 and height != 0:
+                pygame.display.set_mode((width, height), flags=DOUBLEBUF|OPENGL)
+            else:
+                pygame.display.set_mode((0, 0), flags=DOUBLEBUF|OPENGL|FULLSCREEN)
+                width = pygame.display.Info().current_w
+                height = pygame.display.Info().current_h
+
+            pygame.mouse.set_pos([width/2, height/2])
+            pygame.mouse.set_visible(False)
+            pygame.event.set_grab(True)
         self.mouse_is_visible = False
         self.mouse_was_visible = False
-        pygame.event.set_grab(True)
+        # the events handled by the next handleEvents if headless:
+        self.events = []
+        # a headless window pretends every frame took frameTime seconds, so
+        # scripted camera movements are always the same:
+        self.frameTime = 1 / 60
+        self.closed = False
 
         glViewport(0, 0, width, height)
         glEnable(GL_DEPTH_TEST)
@@ -145,12 +249,25 @@ class Window(object):
         # if we want to move a graphics object using arrow keys:
         self.moveableObj = None
 
+        # bytes written to vertex buffers during the last frame (see Mesh):
+        self.uploadStats = {"bytesUploaded": 0, "uploads": 0}
+
         # if we want to detect clicks on GUI elements:
         self.clickableObjs = []
 
         self.width = width
         self.height = height
 
+        # time the stages of the frame with: with window.profiler.stage("name"):
+        # F1 shows the percentiles, F2 records the next profileFrames frames
+        # with cProfile and F3 exports the recorded frames as CSV:
+        self.profiler = FrameProfiler()
+        self.profileFrames = 60
+        self.showProfiler = False
+        self.profilerHUD = None
+        self.profilerLines = []
+        self.profilerUpdateTime = 0
+
     def getRenderer(self):
         return self.renderer
 
@@ -158,7 +275,85 @@ class Window(object):
         glClear(GL_COLOR_BUFFER_BIT|GL_DEPTH_BUFFER_BIT)
 
     def swapBuffers(self):
-        pygame.display.flip()
+        if self.showProfiler:
+            self.renderProfiler()
+        with self.profiler.stage("swapBuffers"):
+            self.renderer.flushQueue()
+            if self.headless:
+                # nothing to show, but the frame should be finished:
+                glFinish()
+            else:
+                pygame.display.flip()
+        self.uploadStats = Mesh.resetCounters()
+        Mesh.endFrame()
+        profilePath = self.profiler.endFrame()
+        if profilePath is not None:
+            print(f"Profile of the last frames written to {profilePath}")
+
+    def renderProfiler(self):
+        """Draws the percentiles of the profiler's stages on the right side"""
+        if self.profilerHUD is None:
+            # only the glyphs, the atlas is created when it's needed first:
+            self.profilerHUD = HUD(Atlas(), aspect=self.height / self.width)
+        # the text changes only 4 times per second, so it can be read:
+        if time.time() - self.profilerUpdateTime > 0.25:
+            self.profilerUpdateTime = time.time()
+            lines = self.profiler.summary()
+            while len(self.profilerLines) < len(lines):
+                self.profilerLines.append(self.profilerHUD.addText("", 0.04))
+            for i, text in enumerate(self.profilerLines):
+                text.setText(lines[i] if i < len(lines) else "")
+                # left aligned:
+                text.move(0.3 + text.width / 2, 0.7 - 0.05 * i)
+        self.profilerHUD.render(self)
+
+    def readFrame(self):
+        """
+        Returns the rendered frame as uint8 array of shape (height, width, 3),
+        the first row is the top of the window (call before swapBuffers,
+        except if headless)!
+        """
+        glPixelStorei(GL_PACK_ALIGNMENT, 1)
+        data = glReadPixels(0, 0, self.width, self.height, GL_RGB, GL_UNSIGNED_BYTE)
+        # OpenGL's first row is the bottom of the image:
+        return np.frombuffer(data, np.uint8).reshape(self.height, self.width, 3)[::-1].copy()
+
+    def postEvents(self, events):
+        """
+        Headless only! The events (pygame events, e.g:
+        pygame.event.Event(KEYDOWN, key=K_w) or
+        pygame.event.Event(MOUSEMOTION, rel=(10, 0))) are handled by the
+        next call of handleEvents!
+        """
+        self.events.extend(events)
+
+    def runScript(self, render, nframes, script=None, types=None, capture=True):
+        """
+        Headless only! Runs a render loop of nframes frames: clearBufferBits,
+        render(frame) (frame is the frame's number), handleEvents(types)
+        with the events script[frame] (a dict of lists of pygame events) and
+        swapBuffers.
+        --------------------------------------------------------------------
+        Returns the frames (see readFrame, only if capture) and the time
+        each frame took in seconds!
+        """
+        frames = []
+        frameTimes = []
+        for frame in range(nframes):
+            start = time.perf_counter()
+            self.clearBufferBits()
+            render(frame)
+            if script and frame in script:
+                self.postEvents(script[frame])
+            self.handleEvents(types)
+            self.swapBuffers()
+            frameTimes.append(time.perf_counter() - start)
+            # the offscreen framebuffer keeps the frame after swapBuffers:
+            if capture:
+                frames.append(self.readFrame())
+            if self.closed:
+                break
+        return frames, frameTimes
 
     def enableMovement(self, obj):
         """
@@ -178,28 +373,50 @@ class Window(object):
         or None, the corresponding shaders getting their view matrix update
         according to the mouse and keyboard input!
         """
+        with self.profiler.stage("handleEvents"):
+            self.processEvents(types)
+
+    def processEvents(self, types):
+        # queued draws still need the old view matrix:
+        self.renderer.flushQueue()
         current_frame_time = time.time()
         deltaTime = current_frame_time - self.last_frame_time
         self.last_frame_time = current_frame_time
 
-        for event in pygame.event.get():
-            if event.type == QUIT:
+        if self.headless:
+            deltaTime = self.frameTime
+            events, self.events = self.events, []
+        else:
+            events = pygame.event.get()
+
+        for event in events:
+            if event.type == QUIT or (event.type == KEYDOWN and event.key == K_ESCAPE):
+                if self.headless:
+                    self.closed = True
+                    continue
                 pygame.quit()
                 sys.exit()
             elif event.type == KEYDOWN:
-                if event.key == K_ESCAPE:
-                    pygame.quit()
-                    sys.exit()
                 if event.key == K_LCTRL:
                     if self.mouse_is_visible:
-                        pygame.mouse.set_visible(False)
+                        if not self.headless:
+                            pygame.mouse.set_visible(False)
+                            pygame.event.set_allowed(MOUSEMOTION)
                         self.mouse_is_visible = False
-                        pygame.event.set_allowed(MOUSEMOTION)
                     else:
-                        pygame.event.set_blocked(MOUSEMOTION)
-                        pygame.mouse.set_visible(True)
+                        if not self.headless:
+                            pygame.event.set_blocked(MOUSEMOTION)
+                            pygame.mouse.set_visible(True)
                         self.mouse_is_visible = True
                         self.mouse_was_visible = True
+                if event.key == K_F1:
+                    self.showProfiler = not self.showProfiler
+                if event.key == K_F2:
+                    self.profiler.startCapture(self.profileFrames)
+                if event.key == K_F3:
+                    path = time.strftime("frames_%Y%m%d_%H%M%S.csv")
+                    self.profiler.exportCSV(path)
+                    print(f"Stage times of the last frames written to {path}")
                 if event.key == K_w:
                     self.w_pressed = True
                 if event.key == K_a:
@@ -234,13 +451,13 @@ class Window(object):
                 if event.key == K_RIGHT:
                     self.right_pressed = False
             elif event.type == MOUSEMOTION:
-                x, y = pygame.mouse.get_rel()
+                x, y = event.rel if self.headless else pygame.mouse.get_rel()
                 if self.mouse_was_visible:
                     self.mouse_was_visible = False
                 else:
                     self.renderer.camera.processMouseMovement(x, -y)
             elif event.type == MOUSEBUTTONUP and len(self.clickableObjs) > 0:
-                x, y = pygame.mouse.get_pos()
+                x, y = event.pos if self.headless else pygame.mouse.get_pos()
                 """
                 Due to the different coordinate systems of OpenGL and pygame we
                 have to convert the x, y values we get to OpenGl's
@@ -442,10 +659,132 @@ class UI_Label(Label, UI_Element):
 
     def render(self, window):
         renderer = window.getRenderer()
-        shader = renderer.selectShader("GUI")
-        shader.use()
-        shader.setInt("hasTexture", 1)
-        renderer.render(self, "GUI")
+        renderer.render(self, "GUI", {"hasTexture": 1})
+
+
+class HUD(object):
+    """
+    Draws images and text of an Atlas (labels, buttons, tick labels, live
+    readouts) from one dynamic quad buffer with one draw call, the items
+    are created with addImage and addText and can be moved, hidden and
+    clicked like UI_Labels. Only the vertices of items which changed are
+    uploaded (see Mesh.updatePositions)!
+    aspect is the window's height / width, so text isn't stretched.
+    """
+    def __init__(self, atlas, maxQuads=1024, aspect=1.0):
+        self.atlas = atlas
+        self.aspect = aspect
+        self.maxQuads = maxQuads
+        self.items = []
+        positions = np.zeros((4 * maxQuads, 3), dtype=np.float32)
+        textures = np.zeros((4 * maxQuads, 2), dtype=np.float32)
+        indices = (np.arange(maxQuads)[:, None] * 4 + [0, 1, 2, 3, 2, 1]).ravel()
+        self.mesh = Mesh(positions, indices, textures=textures, usage=GL_DYNAMIC_DRAW,
+                         textureID=atlas.textureID)
+        self.nquads = 0
+        self.changed = False
+
+    def addImage(self, imgName, width, height):
+        """Returns a HUD_Item showing the image imgName of the atlas"""
+        s0, t0, s1, t1 = self.atlas.images[imgName]
+        corners = Atlas.corners(*np.array([[-width/2], [-height/2], [width/2], [height/2]], np.float32))
+        texCoords = Atlas.corners(*np.array([[s0], [t0], [s1], [t1]], np.float32))
+        return self.add(HUD_Item(self, corners, texCoords, width, height))
+
+    def addText(self, text, height):
+        """Returns a HUD_Text showing text, centered at its position"""
+        return self.add(HUD_Text(self, text, height))
+
+    def add(self, item):
+        self.items.append(item)
+        self.changed = True
+        return item
+
+    def remove(self, item):
+        self.items.remove(item)
+        self.changed = True
+
+    def update(self):
+        """Writes the quads of all visible items into the vertex buffer"""
+        if not self.changed:
+            return
+        self.changed = False
+        items = [item for item in self.items if item.visible and len(item.corners)]
+        if not items:
+            self.nquads = 0
+            return
+        corners = np.concatenate([item.corners + [item.screen_posX, item.screen_posY]
+                                  for item in items]).reshape(-1, 2)
+        texCoords = np.concatenate([item.texCoords for item in items]).reshape(-1, 2)
+        if len(corners) > 4 * self.maxQuads:
+            raise ValueError(f"The HUD can show at most {self.maxQuads} quads!")
+        positions = np.zeros((len(corners), 3), dtype=np.float32)
+        positions[:, :2] = corners
+        self.mesh.updatePositions(positions)
+        self.mesh.updateTextures(texCoords)
+        self.nquads = len(corners) // 4
+
+    def draw(self):
+        self.update()
+        if self.nquads == 0:
+            return
+        # the edges of the glyphs are partly transparent:
+        glEnable(GL_BLEND)
+        glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
+        self.mesh.draw(GL_TRIANGLES, 6 * self.nquads, 0)
+        glDisable(GL_BLEND)
+
+    def render(self, window):
+        renderer = window.getRenderer()
+        renderer.render(self, "GUI", {"hasTexture": 1})
+
+
+class HUD_Item(UI_Element):
+    """
+    Quads of a HUD, corners and texCoords of shape (n, 4, 2) are relative
+    to the item's position set with move!
+    """
+    def __init__(self, hud, corners, texCoords, width, height):
+        UI_Element.__init__(self, width, height)
+        self.hud = hud
+        self.corners = corners
+        self.texCoords = texCoords
+        self._visible = True
+
+    def move(self, x, y):
+        self.screen_posX = x
+        self.screen_posY = y
+        self.hud.changed = True
+
+    @property
+    def visible(self):
+        return self._visible
+
+    @visible.setter
+    def visible(self, visible):
+        if visible != self._visible:
+            self._visible = visible
+            self.hud.changed = True
+
+    def gotClicked(self, x, y):
+        return self.visible and UI_Element.gotClicked(self, x, y)
+
+
+class HUD_Text(HUD_Item):
+    """Text of a HUD which can be changed at runtime with setText"""
+    def __init__(self, hud, text, height):
+        HUD_Item.__init__(self, hud, None, None, 0, height)
+        self.text = None
+        self.setText(text)
+
+    def setText(self, text):
+        text = str(text)
+        if text == self.text:
+            return
+        self.text = text
+        self.corners, self.texCoords, self.width = self.hud.atlas.layoutText(
+            text, self.height, self.hud.aspect)
+        self.hud.changed = True
 
 
 class UI_Bar(UI_Element):
@@ -457,7 +796,7 @@ class UI_Bar(UI_Element):
                      origin + Point(width/2, height, 0)]
         indices = [0, 1, 2,
                    3, 2, 1]
-        self.mesh = Mesh(positions, indices)
+        self.mesh = Mesh(positions, indices, usage=GL_DYNAMIC_DRAW)
         self.origin = origin
 
     def draw(self):
@@ -477,10 +816,7 @@ class UI_Bar(UI_Element):
 
     def render(self, window):
         renderer = window.getRenderer()
-        shader = renderer.selectShader("GUI")
-        shader.use()
-        shader.setInt("hasTexture", 0)
-        renderer.render(self, "GUI")
+        renderer.render(self, "GUI", {"hasTexture": 0})
 
 
 class UI_Axis(UI_Element):
@@ -507,10 +843,7 @@ class UI_Axis(UI_Element):
 
     def render(self, window):
         renderer = window.getRenderer()
-        shader = renderer.selectShader("GUI")
-        shader.use()
-        shader.setInt("hasTexture", 0)
-        renderer.render(self, "GUI")
+        renderer.render(self, "GUI", {"hasTexture": 0})
 
 
 class UI_Tick(UI_Element):
@@ -534,49 +867,73 @@ class UI_Tick(UI_Element):
 
     def render(self, window):
         renderer = window.getRenderer()
-        shader = renderer.selectShader("GUI")
-        shader.use()
-        shader.setInt("hasTexture", 0)
-        renderer.render(self, "GUI")
+        renderer.render(self, "GUI", {"hasTexture": 0})
 
 
 class BarPlot(UI_Element):
-    def __init__(self, origin, xLength, yLength, nbars, maxValue):
-        UI_Element.__init__(self, None, None) # no need for onClick detection!
-
-        self.objs = []
-        xEndPoint = Point(origin.x + xLength, origin.y, origin.z)
-        yEndPoint = Point(origin.x, origin.y + yLength, origin.z)
-        xAxis = UI_Axis(origin, xEndPoint, nbars)
-        self.objs.append(xAxis)
-        yAxis = UI_Axis(origin, yEndPoint, 5)
-        self.objs.append(yAxis)
-
-        for origin in xAxis.tick_origins:
-            self.objs.append(UI_Tick(origin=origin))
+    """
+    Axes, ticks and bars are stored in two meshes: the lines never change
+    and the bars get their heights from one uniform array, so the whole
+    plot is drawn with two draw calls however many bars there are!
+    """
+    # the size of the heights array in GUIshaderBar.vs:
+    maxBars = 128
 
-        for origin in yAxis.tick_origins:
-            self.objs.append(UI_Tick(origin=origin, oriantation="horizontal"))
+    def __init__(self, origin, xLength, yLength, nbars, maxValue, barWidth=0.05, tickLength=0.05):
+        UI_Element.__init__(self, None, None) # no need for onClick detection!
 
-        self.bars = [UI_Bar(0.05, yLength, origin=origin) for origin in xAxis.tick_origins]
-        self.bars[0].mesh.positions[0]
-        self.objs.extend(self.bars)
+        if nbars > BarPlot.maxBars:
+            raise ValueError(f"BarPlot supports at most {BarPlot.maxBars} bars!")
+
+        o = np.array([origin.x, origin.y, origin.z], dtype=np.float32)
+        # the same tick positions as UI_Axis, the bars stand on the x ticks:
+        xTicks = o + np.outer(np.arange(1, nbars + 1) * xLength / nbars, [1, 0, 0])
+        yTicks = o + np.outer(np.arange(1, 6) * yLength / 5, [0, 1, 0])
+        xTick = np.array([0, tickLength/2, 0], dtype=np.float32)
+        yTick = np.array([tickLength/2, 0, 0], dtype=np.float32)
+
+        # GL_LINES, two vertices per line: the axes, then the ticks:
+        lines = [o, o + [xLength, 0, 0], o, o + [0, yLength, 0]]
+        lines.extend(p for tick in xTicks for p in (tick + xTick, tick - xTick))
+        lines.extend(p for tick in yTicks for p in (tick + yTick, tick - yTick))
+        lines = np.array(lines, dtype=np.float32)
+        self.lines = Mesh(lines, np.arange(len(lines)))
+
+        # 4 vertices per bar, z is 0 at the bottom and the bar index + 1 at
+        # the top, so the shader knows which height to add:
+        corners = np.array([[-barWidth/2, 0, 0], [barWidth/2, 0, 0],
+                            [-barWidth/2, 0, 1], [barWidth/2, 0, 1]], dtype=np.float32)
+        bars = xTicks[:, None, :] * [1, 1, 0] + corners
+        bars[:, 2:, 2] += np.arange(nbars)[:, None]
+        indices = (np.arange(nbars)[:, None] * 4 + [0, 1, 2, 3, 2, 1]).ravel()
+        self.bars = Mesh(bars.reshape(-1, 3), indices)
 
         self.nbars = nbars
         self.yLength = yLength
         self.maxValue = maxValue
+        self.heights = np.full(nbars, yLength, dtype=np.float32)
 
     def updateBarHeights(self, new_barHeights):
-        for new_barHeight, bar in zip(new_barHeights, self.bars):
-            scaled_barHeight = self.yLength * (new_barHeight / self.maxValue)
-            bar.barHeight = scaled_barHeight
+        """Sets the heights of all bars from values in [0, maxValue] at once"""
+        values = np.asarray(new_barHeights, dtype=np.float32)[:self.nbars]
+        # a new array, a queued render still uses the heights it was given:
+        heights = self.heights.copy()
+        heights[:len(values)] = self.yLength * (values / self.maxValue)
+        self.heights = heights
 
     def normalizeValues(self, values):
         return [value / self.maxValue for value in values]
 
+    def drawLines(self):
+        self.lines.draw(GL_LINES, len(self.lines.indices), 0)
+
+    def drawBars(self):
+        self.bars.draw(GL_TRIANGLES, len(self.bars.indices), 0)
+
     def render(self, window):
-        for obj in self.objs:
-            obj.render(window)
+        renderer = window.getRenderer()
+        renderer.render(self, "GUI", {"hasTexture": 0}, draw=self.drawLines)
+        renderer.render(self, "GUIBar", {"heights": self.heights}, draw=self.drawBars)
 
 
 class Backbone(object):
@@ -587,7 +944,7 @@ class Backbone(object):
         indices = [i for i in range(n)] # for GL_LINE_STRIP
         colors = [[0.0, 0.0, 0.0, 1.0] for _ in range(n)]
         # positions, indices and colors - lists can be accessed over the mesh
-        self.mesh = Mesh(positions, indices, colors=colors)
+        self.mesh = Mesh(positions, indices, colors=colors, usage=GL_STREAM_DRAW)
 
     def draw(self):
         self.mesh.draw(GL_LINE_STRIP, len(self.mesh.indices), 0)
@@ -604,34 +961,29 @@ class Backbone(object):
         """
         Class Method!
         Interpolate between the backbone start and end positions, e.g. to get
-        the backbone positions for 50% of the bending process p must be 0.5
+        the backbone positions for 50% of the bending process p must be 0.5,
+        all positions are calculated at once, returns a numpy array (n, 3)!
         """
-        if p > 1.0:
-            p = 1.0
-        elif p < 0.0:
-            p = 0.0
-        backbone_interpolate_positions = []
+        p = min(max(p, 0.0), 1.0)
+        start = np.asarray(backbone_start_positions, dtype=np.float64)
+        end = np.asarray(backbone_end_positions, dtype=np.float64)
+        # the first position stays at the origin:
+        y_s = start[1:, 1]
+        x_e = end[1:, 0]
+        y_e = end[1:, 1]
+        a = x_e / np.sqrt(y_s**2 - y_e**2)
         t_s = math.pi/2
-        is_first = True
-        for pos_s, pos_e in zip(backbone_start_positions, backbone_end_positions):
-            if is_first:
-                is_first = False
-                backbone_interpolate_positions.append([0.0, 0.0, 0.0])
-                continue
-            y_s = pos_s[1]
-            x_e = pos_e[0]
-            y_e = pos_e[1]
-            a = x_e / math.sqrt(y_s**2 - y_e**2)
-            t_e = math.asin(y_e / y_s)
-            t = t_s + p * (t_e - t_s)
-            x_new = a * y_s * math.cos(t)
-            y_new = y_s * math.sin(t)
-            backbone_interpolate_positions.append([x_new, y_new, 0.0])
+        t_e = np.arcsin(y_e / y_s)
+        t = t_s + p * (t_e - t_s)
+        backbone_interpolate_positions = np.zeros((len(start), 3))
+        backbone_interpolate_positions[1:, 0] = a * y_s * np.cos(t)
+        backbone_interpolate_positions[1:, 1] = y_s * np.sin(t)
         return backbone_interpolate_positions
 
 
 class SoftRobot(object):
-    def __init__(self, n, bending_radius, cylinder_radius, color=[0.5, 0.5, 0.5, 1.0], m=32):
+    def __init__(self, n, bending_radius, cylinder_radius, color=[0.5, 0.5, 0.5, 1.0], m=32,
+                 gpu_skinning=False):
         """
         Create a cylinder shaped soft robot model to visualize sensor data.
 
@@ -639,8 +991,15 @@ class SoftRobot(object):
         parameter bending_radius: radius of robot backbone fully bent
         parameter cylinder_radius: radius of cylindric robot skin
         parameter color: start color for the whole robot skin
+        parameter gpu_skinning: if True the vertices stay as they are and the
+                                shaderPCSkin vertex shader bends them, then
+                                updateSkinVertices only remembers p
+                                (remember to pass "PCSkin" to window.handleEvents)
         """
         self.n = n
+        self.bending_radius = bending_radius
+        self.gpu_skinning = gpu_skinning
+        self.p = 0.0
         self.m = m # blender default value for number of vertices of a circle
         self.default_color = color
 
@@ -669,6 +1028,9 @@ class SoftRobot(object):
         the SoftRobot.transformSkinVertices method!
         """
         self.base_circle = positions[:self.m + 1]
+        self.base_circle_array = np.array(self.base_circle)
+        # the transformed circles are written into this buffer:
+        self.skin_positions = np.empty((self.n, self.m + 1, 3), dtype=np.float32)
 
         self.mantle_indices_offset = len(indices)
 
@@ -691,81 +1053,58 @@ class SoftRobot(object):
 
         self.mantle_indices_size = (n - 1) * len(mantle_indices)
 
-        # positions, indices and colors - lists can be accessed over the mesh
-        self.mesh = Mesh(positions, indices, colors=colors)
+        # indices for the black circles around the SoftRobot, one GL_LINES
+        # draw call for all circles:
+        self.outline_indices_offset = len(indices)
+        for i in range(n):
+            first = i * (m + 1) + 1
+            for j in range(m):
+                indices.extend([first + j, first + (j + 1) % m])
+        self.outline_indices_size = len(indices) - self.outline_indices_offset
+        self.outline_color = [0.0, 0.0, 0.0, 1.0]
+
+        # positions, indices and colors - lists can be accessed over the mesh,
+        # the positions change every frame if bent on the CPU, the colors
+        # whenever the sensor values change:
+        usage = GL_DYNAMIC_DRAW if gpu_skinning else GL_STREAM_DRAW
+        self.mesh = Mesh(positions, indices, colors=colors, usage=usage)
 
     def updateSkinVertices(self, p):
+        if self.gpu_skinning:
+            # the shader calculates the same in render:
+            self.p = p
+            return
         positions = Backbone.interpolate(p,
                                          self.backbone_start_positions,
                                          self.backbone_end_positions)
         self.backbone.update(positions)
 
-        rms, tms = [], [] # rotation and translation matrices
-        v_n0 = glm.vec3(0.0, 1.0, 0.0) # normal vector of first circle area!
-        for i in range(self.n): # 0,... (n - 1)
-            p_i = positions[i] # position p_i of the backbone
-            rm, tm = glm.mat4(), glm.mat4() # initialize unit matrices
-            tm = glm.translate(tm, glm.vec3(p_i[0], p_i[1], p_i[2]))
-
-            tms.append(tm)
-
-            # if first backbone position:
-            if i == 0:
-                rms.append(rm) # append a unit matrix = no rotation
-                continue
-
-            # if last backbone position:
-            if i == (self.n - 1):
-                # position vector p_(i-1):
-                p_i_prev = glm.vec3(positions[i-1][0],
-                                    positions[i-1][1],
-                                    positions[i-1][2])
-                # normalized gradient vector at p_i:
-                v_ni = glm.normalize(p_i - p_i_prev)
-
-                if v_ni == v_n0:
-                    rms.append(rm) # append a unit matrix = no rotation
-                    continue
-
-                angle = glm.acos(glm.length(v_n0 * v_ni)) # get the rotation angle
-                rot_axis = glm.cross(v_n0, v_ni) # get the rotation axis
-                rm = glm.rotate(rm, angle, rot_axis)
-                rms.append(rm) # append the rotation matrix
-                continue
-
-            # position vector p_(i+1):
-            p_i_next = glm.vec3(positions[i+1][0],
-                                positions[i+1][1],
-                                positions[i+1][2])
-            # position vector p_(i-1):
-            p_i_prev = glm.vec3(positions[i-1][0],
-                                positions[i-1][1],
-                                positions[i-1][2])
-            # normalized gradient vector at p_i:
-            v_ni = glm.normalize(p_i_next - p_i_prev)
-
-            if v_ni == v_n0:
-                rms.append(rm) # append a unit matrix = no rotation
-                continue
-
-            angle = glm.acos(glm.length(v_n0 * v_ni)) # get the rotation angle
-            rot_axis = glm.cross(v_n0, v_ni) # get the rotation axis
-            rm = glm.rotate(rm, angle, rot_axis)
-            rms.append(rm) # append the rotation matrix
-
-        # use transformation matrices for skin vertices
-        new_positions = []
-        for tm, rm in zip(tms, rms):
-            for position in self.base_circle:
-                # we need a glm.vec4 to apply matrix transformations
-                vec4_pos = glm.vec4(position[0],
-                                    position[1],
-                                    position[2],
-                                    1.0)
-                vec4_pos = tm * rm * vec4_pos # apply translation
-                new_positions.append([vec4_pos.x, vec4_pos.y, vec4_pos.z])
-
-        self.mesh.updatePositions(new_positions)
+        # normalized gradient vectors at the backbone positions (the
+        # first circle is never rotated, the last uses a one sided gradient):
+        gradients = np.zeros_like(positions)
+        gradients[1:-1] = positions[2:] - positions[:-2]
+        gradients[-1] = positions[-1] - positions[-2]
+        gradients[1:] /= np.linalg.norm(gradients[1:], axis=1, keepdims=True)
+
+        # rotate the normal vector of the first circle area (0, 1, 0) onto the
+        # gradients: the axis is cross((0, 1, 0), v) = (v.z, 0, -v.x) and
+        # the angle acos(|v.y|), the matrices follow from Rodrigues' formula
+        axes = np.stack((gradients[:, 2], np.zeros(self.n), -gradients[:, 0]), axis=1)
+        lengths = np.linalg.norm(axes, axis=1)
+        rotate = lengths > 1e-12 # no rotation if the gradient is (0, 1, 0)
+        axes[rotate] /= lengths[rotate, None]
+        angles = np.where(rotate, np.arccos(np.clip(np.abs(gradients[:, 1]), 0.0, 1.0)), 0.0)
+        k = np.zeros((self.n, 3, 3)) # cross product matrices of the axes
+        k[:, 0, 1], k[:, 0, 2] = -axes[:, 2], axes[:, 1]
+        k[:, 1, 0], k[:, 1, 2] = axes[:, 2], -axes[:, 0]
+        k[:, 2, 0], k[:, 2, 1] = -axes[:, 1], axes[:, 0]
+        rms = (np.eye(3) + np.sin(angles)[:, None, None] * k
+               + (1 - np.cos(angles))[:, None, None] * (k @ k))
+
+        # rotate and translate the base circle for all circles at once:
+        np.add(np.einsum("nij,mj->nmi", rms, self.base_circle_array),
+               positions[:, None, :], out=self.skin_positions, casting="same_kind")
+        self.mesh.updatePositions(self.skin_positions.reshape(-1, 3))
 
     def updateColors(self, sensor_values, min_color=[0, 1, 0, 1], max_color=[1, 0, 0, 1]):
         """
@@ -799,18 +1138,23 @@ class SoftRobot(object):
         # draw SoftRobot skin out of cylinder mantles:
         self.mesh.draw(GL_TRIANGLE_STRIP, self.mantle_indices_size, self.mantle_indices_offset)
 
-        # draw black circles around the SoftRobot:
-        prev_colors = self.mesh.colors
-        self.mesh.updateColors([[0, 0, 0, 1] for _ in prev_colors])
-        for circle_offset in self.cirlce_indices_offsets:
-            self.mesh.draw(GL_LINE_LOOP, self.m, circle_offset + 1)
-
-        # reset colors:
-        self.mesh.updateColors(prev_colors)
+    def drawOutlines(self):
+        # all circles around the SoftRobot at once, for the color see render:
+        self.mesh.draw(GL_LINES, self.outline_indices_size, self.outline_indices_offset)
 
     def render(self, window):
         renderer = window.getRenderer()
-        renderer.render(self, "PC")
+        type = "PCSkin" if self.gpu_skinning else "PC"
+        uniforms = {}
+        if self.gpu_skinning:
+            # the backbone and the skin are bent by the shader:
+            uniforms = {"p": float(self.p),
+                        "n": self.n,
+                        "bendingRadius": float(self.bending_radius)}
+        renderer.render(self, type, uniforms)
+        # the shader draws the circles in outline_color, the vertex colors stay:
+        outline = dict(uniforms, useOverrideColor=1, overrideColor=tuple(self.outline_color))
+        renderer.render(self, type, outline, draw=self.drawOutlines)
 
     def createSkinVertices(self, backbone_positions, radius):
         positions = []
@@ -1,167 +1,181 @@
 from OpenGL.GL import *
-from OpenGL.GLU import *
-from ctypes import c_void_p
+from ctypes import c_void_p, memmove
 import numpy as np
-from PIL import Image
 
-from utils import fullpath
+from glstate import state
+from textures import cache
 
 class Mesh():
 
-    def __init__(self, positions, indices, colors=None, textures=None, imgName=None):
+    # bytes written to vertex buffers by all meshes since Mesh.resetCounters:
+    bytesUploaded = 0
+    uploads = 0
+    # vertex buffers of a mesh which isn't GL_STATIC_DRAW, the GPU may still
+    # draw from the last ones while the next one is written, it's also the
+    # number of frames the GPU may lag behind (see endFrame):
+    streamBuffers = 3
+    # the number of the current frame, the fences of the frames the GPU may
+    # still work on and the last frame which is done for sure:
+    frame = 0
+    frameFences = []
+    completedFrame = -1
+
+    def __init__(self, positions, indices, colors=None, textures=None, imgName=None,
+                 usage=GL_STATIC_DRAW, textureID=None):
         """
         Create a Mesh which contains vertices, each vertex must have a
         position and indices to draw, optional are color and/or texture attribute
         The color/texture attribute can be set over colors/textures kwargs!
-        (For the texture we have to specify an image as well using imgName)
+        (For the texture we have to specify an image as well using imgName,
+        or the id of an existing texture, e.g. of an Atlas, using textureID)
 
         The position attribute must be in [x, y, z] format!
         The color attribute must be in [r, g, b, a] format!
         The texture attribute must be in [s, t] format!
 
         All information is stored in lists, e.g: Mesh.positions and so on...
+        (float32 numpy arrays of shape (n, 3), (n, 4) and (n, 2) work as well)
+
+        For meshes which change every frame use usage=GL_DYNAMIC_DRAW or
+        GL_STREAM_DRAW, they get several vertex buffers which are written in
+        turn and updates only upload the vertices which changed (see flush)!
         """
         self.positions = positions
         self.indices = indices
         self.colors = colors
         self.textures = textures
 
+        # the vertex buffer holds all positions, then all colors and then
+        # all texture coordinates:
         positions = np.array(positions, dtype=np.float32)
-        poffset = 0 # c_void_p will throw errors here!!!
+        poffset = 0
         psize = positions.nbytes
+        data_size = psize
 
-        if self.colors != None and self.textures != None:
-            colors = np.array(colors, dtype=np.float32)
-            coffset = psize # c_void_p will throw errors here!!!
-            csize = colors.nbytes
-
-            textures = np.array(textures, dtype=np.float32)
-            toffset = psize + csize # c_void_p will throw errors here!!!
-            tsize = textures.nbytes
-            data_size = psize + csize + tsize
-
-        elif self.colors != None:
+        if self.colors is not None:
             colors = np.array(colors, dtype=np.float32)
-            coffset = psize # c_void_p will throw errors here!!!
+            coffset = data_size
             csize = colors.nbytes
-            data_size = psize + csize
+            data_size += csize
 
-        elif self.textures != None:
+        if self.textures is not None:
             textures = np.array(textures, dtype=np.float32)
-            toffset = psize # c_void_p will throw errors here!!!
+            toffset = data_size
             tsize = textures.nbytes
-            data_size = psize + tsize
-        else:
-            data_size = psize
+            data_size += tsize
+
+        # copy of the vertex buffer, updates are compared with it and only
+        # the changed byte ranges are uploaded before drawing:
+        self.usage = usage
+        self.data = np.empty(data_size // 4, dtype=np.float32)
+        self.positionData = self.data[poffset // 4:(poffset + psize) // 4].reshape(-1, 3)
+        self.positionData[:] = positions
+        if self.colors is not None:
+            self.colorData = self.data[coffset // 4:(coffset + csize) // 4].reshape(-1, 4)
+            self.colorData[:] = colors
+        if self.textures is not None:
+            self.textureData = self.data[toffset // 4:(toffset + tsize) // 4].reshape(-1, 2)
+            self.textureData[:] = textures
 
         indices = np.array(indices, dtype=np.uint32)
         self.indices = indices # save indices as numpy array for drawing
 
-        self.VAO = glGenVertexArrays(1)
-        glBindVertexArray(self.VAO)
-
-        self.VBO = glGenBuffers(1)
-        glBindBuffer(GL_ARRAY_BUFFER, self.VBO)
-        glBufferData(GL_ARRAY_BUFFER, data_size, None, GL_STATIC_DRAW)
-
+        # a mesh which gets updated has several vertex buffers (each with its
+        # own VAO) which are written in turn, see flush:
+        nbuffers = 1 if usage == GL_STATIC_DRAW else Mesh.streamBuffers
+        self.VAOs = [glGenVertexArrays(1) for _ in range(nbuffers)]
+        self.VBOs = [glGenBuffers(1) for _ in range(nbuffers)]
+        # the byte ranges each vertex buffer misses and the last frame which
+        # drew from it:
+        self.dirty = [[] for _ in range(nbuffers)]
+        self.drawnFrames = [Mesh.frame] * nbuffers
+        self.current = 0
+
+        state.bindVertexArray(self.VAOs[0])
         self.EBO = glGenBuffers(1)
         glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, self.EBO)
         glBufferData(GL_ELEMENT_ARRAY_BUFFER, indices.nbytes, indices, GL_STATIC_DRAW)
 
-        glBufferSubData(GL_ARRAY_BUFFER, poffset, psize, positions)
-
-        # positions:
-        offset = c_void_p(0)
-        glEnableVertexAttribArray(0) # layout(location = 0)
-        stride = 3 * positions.itemsize
-        glVertexAttribPointer(0, 3, GL_FLOAT, False, stride, offset)
-
-        if self.colors != None and textures != None:
-            glBufferSubData(GL_ARRAY_BUFFER, coffset, csize, colors)
-            glBufferSubData(GL_ARRAY_BUFFER, toffset, tsize, textures)
-
-            # colors:
-            offset = c_void_p(psize)
-            glEnableVertexAttribArray(1) # layout(location = 1)
-            stride = 4 * colors.itemsize
-            glVertexAttribPointer(1, 4, GL_FLOAT, False, stride, offset)
-
-            # textures:
-            offset = c_void_p(psize + csize)
-            glEnableVertexAttribArray(2) # layout(location = 2)
-            stride = 2 * textures.itemsize
-            glVertexAttribPointer(2, 2, GL_FLOAT, False, stride, offset)
-
-
-        elif self.colors != None:
-            glBufferSubData(GL_ARRAY_BUFFER, coffset, csize, colors)
-
-            # colors:
-            offset = c_void_p(psize)
-            glEnableVertexAttribArray(1) # layout(location = 1)
-            stride = 4 * colors.itemsize
-            glVertexAttribPointer(1, 4, GL_FLOAT, False, stride, offset)
-
-        elif self.textures != None:
-            glBufferSubData(GL_ARRAY_BUFFER, toffset, tsize, textures)
-
-            # textures:
-            offset = c_void_p(psize)
-            glEnableVertexAttribArray(2) # layout(location = 2)
-            stride = 2 * textures.itemsize
-            glVertexAttribPointer(2, 2, GL_FLOAT, False, stride, offset)
-
-        if self.textures != None:
-            imgPath = fullpath(imgName)
-            img = Image.open(imgPath).transpose(Image.FLIP_TOP_BOTTOM)
-            imgData = np.fromstring(img.tobytes(), np.uint8)
-
-            glEnable(GL_TEXTURE_2D)
-            self.textureID = glGenTextures(1)
-            glPixelStorei(GL_UNPACK_ALIGNMENT, 1)
-            glBindTexture(GL_TEXTURE_2D, self.textureID)
-            # set texture wrapping parameters
-            glTexParameterf(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, GL_REPEAT)
-            glTexParameterf(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, GL_REPEAT)
-            # set texture filtering parameters
-            glTexParameterf(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
-            glTexParameterf(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_LINEAR_MIPMAP_LINEAR)
-            gluBuild2DMipmaps(GL_TEXTURE_2D, GL_RGB, img.size[0], img.size[1], GL_RGB, GL_UNSIGNED_BYTE, imgData)
+        for VAO, VBO in zip(self.VAOs, self.VBOs):
+            state.bindVertexArray(VAO)
+            glBindBuffer(GL_ARRAY_BUFFER, VBO)
+            glBufferData(GL_ARRAY_BUFFER, data_size, self.data, usage)
+            glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, self.EBO)
+
+            # positions:
+            glEnableVertexAttribArray(0) # layout(location = 0)
+            glVertexAttribPointer(0, 3, GL_FLOAT, False, 3 * 4, c_void_p(poffset))
+
+            if self.colors is not None:
+                # colors:
+                glEnableVertexAttribArray(1) # layout(location = 1)
+                glVertexAttribPointer(1, 4, GL_FLOAT, False, 4 * 4, c_void_p(coffset))
+
+            if self.textures is not None:
+                # textures:
+                glEnableVertexAttribArray(2) # layout(location = 2)
+                glVertexAttribPointer(2, 2, GL_FLOAT, False, 2 * 4, c_void_p(toffset))
+        self.VAO = self.VAOs[0]
+        self.VBO = self.VBOs[0]
+
+        if self.textures is not None and textureID is not None:
+            # the texture is shared, e.g. with other meshes of an Atlas:
+            self.textureID = textureID
+        elif self.textures is not None:
+            # meshes with the same image share one texture (see TextureCache):
+            self.textureID = cache.get(imgName)
 
         self.poffset = poffset
         self.psize = psize
 
-        if self.colors != None:
+        if self.colors is not None:
             self.coffset = coffset
             self.csize = csize
 
-        if self.textures != None:
+        if self.textures is not None:
             self.toffset = toffset
             self.tsize = tsize
 
         # unbind buffers:
-        glBindVertexArray(0)
+        state.bindVertexArray(0)
         glBindBuffer(GL_ARRAY_BUFFER, 0)
         glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, 0)
-        if self.textures:
-            glBindTexture(GL_TEXTURE_2D, 0)
 
     def draw(self, mode, size, offset):
-        # bind the VAO, it contains all info about the buffers and attributes:
-        glBindVertexArray(self.VAO)
-        if self.textures:
-            glBindTexture(GL_TEXTURE_2D, self.textureID)
+        self.flush()
+        # bind the VAO, it contains all info about the buffers and attributes
+        # (skipped if it's still bound from the last draw):
+        state.bindVertexArray(self.VAO)
+        self.drawnFrames[self.current] = Mesh.frame
+        if self.textures is not None:
+            state.bindTexture(GL_TEXTURE_2D, self.textureID)
         # to calculate the offset in bytes as required:
         offset = c_void_p(offset * self.indices.itemsize)
         # draw the data with the help of the indices:
         glDrawElements(mode, size, GL_UNSIGNED_INT, offset)
 
-    def updatePositions(self, positions):
-        self.positions = positions
-        glBindBuffer(GL_ARRAY_BUFFER, self.VBO)
-        positions = np.array(positions, dtype=np.float32)
-        glBufferSubData(GL_ARRAY_BUFFER, self.poffset, self.psize, positions)
-        glBindBuffer(GL_ARRAY_BUFFER, 0)
+    def updatePositions(self, positions, first=0):
+        """
+        Sets the positions of the vertices first, first + 1,... (a list or a
+        float32 numpy array of shape (n, 3)), the upload happens in draw!
+        """
+        if first == 0 and len(positions) == len(self.positionData):
+            self.positions = positions
+        else:
+            # self.positions must stay up to date, e.g. move starts from it:
+            Mesh.setRange(self.positions, positions, first)
+        self.updateAttribute(self.positionData, positions, first)
+
+    def setRange(values, newValues, first):
+        """
+        Class Method!
+        Writes newValues into values[first:first + len(newValues)], values
+        is a list of [x, y, z,...] lists or a numpy array!
+        """
+        if isinstance(values, np.ndarray):
+            values[first:first + len(newValues)] = newValues
+        else:
+            values[first:first + len(newValues)] = np.asarray(newValues).tolist()
 
     def move(self, x, y, z):
         new_positions = []
@@ -172,12 +186,111 @@ class Mesh():
             new_positions.append(position)
         self.updatePositions(new_positions)
 
-    def updateColors(self, colors):
-        self.colors = colors
+    def updateColors(self, colors, first=0):
+        """
+        Sets the colors of the vertices first, first + 1,... (a list or a
+        float32 numpy array of shape (n, 4)), the upload happens in draw!
+        """
+        if first == 0 and len(colors) == len(self.colorData):
+            self.colors = colors
+        else:
+            Mesh.setRange(self.colors, colors, first)
+        self.updateAttribute(self.colorData, colors, first)
+
+    def updateTextures(self, textures, first=0):
+        """
+        Sets the texture coordinates of the vertices first, first + 1,... (a
+        list or a float32 numpy array of shape (n, 2)), the upload happens in draw!
+        """
+        if first == 0 and len(textures) == len(self.textureData):
+            self.textures = textures
+        else:
+            Mesh.setRange(self.textures, textures, first)
+        self.updateAttribute(self.textureData, textures, first)
+
+    def updateAttribute(self, attributeData, values, first):
+        # float32 arrays are used as they are, lists are converted once:
+        values = np.asarray(values, dtype=np.float32)
+        region = attributeData[first:first + len(values)]
+        changed = np.flatnonzero((region != values).any(axis=1))
+        if len(changed) == 0:
+            return
+        start, end = int(changed[0]), int(changed[-1]) + 1
+        region[start:end] = values[start:end]
+        rowSize = attributeData.strides[0]
+        byteOffset = attributeData.ctypes.data - self.data.ctypes.data + first * rowSize
+        for dirty in self.dirty:
+            dirty.append((byteOffset + start * rowSize, byteOffset + end * rowSize))
+
+    def flush(self):
+        """
+        Uploads the changes before drawing without waiting for draw calls
+        which still use the vertex buffer:
+        a GL_STATIC_DRAW mesh has one vertex buffer, it's orphaned (the
+        driver gives us new memory while the GPU may still draw from the old
+        one) and written completely.
+        Other meshes switch to their next vertex buffer and write the bytes
+        it missed since it was used the last time, unsynchronized in one
+        mapping. That's only safe if the GPU is done with the frame which
+        drew from it the last time (see endFrame), otherwise this buffer
+        is orphaned as well!
+        """
+        if not self.dirty[self.current]:
+            return
+        if len(self.VBOs) > 1:
+            self.current = (self.current + 1) % len(self.VBOs)
+            self.VAO = self.VAOs[self.current]
+            self.VBO = self.VBOs[self.current]
+        dirty = self.dirty[self.current]
+        self.dirty[self.current] = []
+
         glBindBuffer(GL_ARRAY_BUFFER, self.VBO)
-        colors = np.array(colors, dtype=np.float32)
-        glBufferSubData(GL_ARRAY_BUFFER, self.coffset, self.csize, colors)
+        if len(self.VBOs) == 1 or self.drawnFrames[self.current] > Mesh.completedFrame:
+            glBufferData(GL_ARRAY_BUFFER, self.data.nbytes, self.data, self.usage)
+            size = self.data.nbytes
+        else:
+            # one mapping from the first to the last changed byte, the
+            # unchanged bytes in between are copied as well, that's cheaper
+            # than a mapping per range:
+            start = min(start for start, _ in dirty)
+            end = max(end for _, end in dirty)
+            access = GL_MAP_WRITE_BIT | GL_MAP_INVALIDATE_RANGE_BIT | GL_MAP_UNSYNCHRONIZED_BIT
+            pointer = glMapBufferRange(GL_ARRAY_BUFFER, start, end - start, access)
+            memmove(pointer, self.data.ctypes.data + start, end - start)
+            glUnmapBuffer(GL_ARRAY_BUFFER)
+            size = end - start
         glBindBuffer(GL_ARRAY_BUFFER, 0)
+        Mesh.bytesUploaded += size
+        Mesh.uploads += 1
+
+    def endFrame():
+        """
+        Class Method!
+        Must be called once per frame after the last draw (Window.swapBuffers
+        does it): puts a fence behind the draws of the frame and, only if the
+        GPU lags streamBuffers - 1 frames behind, waits for the oldest frame.
+        Vertex buffers drawn in frames up to Mesh.completedFrame aren't read
+        by the GPU anymore, flush writes them unsynchronized!
+        """
+        Mesh.frameFences.append((Mesh.frame, glFenceSync(GL_SYNC_GPU_COMMANDS_COMPLETE, 0)))
+        Mesh.frame += 1
+        while len(Mesh.frameFences) >= Mesh.streamBuffers:
+            frame, fence = Mesh.frameFences.pop(0)
+            while glClientWaitSync(fence, GL_SYNC_FLUSH_COMMANDS_BIT, 1000000000) == GL_TIMEOUT_EXPIRED:
+                pass
+            glDeleteSync(fence)
+            Mesh.completedFrame = frame
+
+    def resetCounters():
+        """
+        Class Method!
+        Returns the bytes uploaded and the number of uploads since the last
+        call (e.g. once per frame) and starts counting again!
+        """
+        counters = {"bytesUploaded": Mesh.bytesUploaded, "uploads": Mesh.uploads}
+        Mesh.bytesUploaded = 0
+        Mesh.uploads = 0
+        return counters
 
     def __repr__(self):
         return "data:\n{}\nindices:\n{}\n".format(self.data, self.indices)
@@ -0,0 +1,68 @@
+import os
+# PyOpenGL chooses its platform when OpenGL is imported the first time, so
+# for a headless Window this module must be imported before graphics:
+os.environ.setdefault("PYOPENGL_PLATFORM", "egl")
+# Mesa can render without any X11/Wayland display or surface:
+os.environ.setdefault("EGL_PLATFORM", "surfaceless")
+
+import ctypes
+import OpenGL.platform
+from OpenGL.GL import *
+
+
+class OffscreenContext(object):
+    """
+    OpenGL context without a window (EGL, e.g. Mesa's software rasterizer
+    llvmpipe on a server without GPU or display), everything is rendered
+    into a framebuffer object of width x height pixels!
+    """
+    def __init__(self, width, height):
+        if "EGL" not in type(OpenGL.platform.PLATFORM).__name__:
+            raise RuntimeError("OpenGL was imported before offscreen, import offscreen "
+                               "before graphics or set PYOPENGL_PLATFORM=egl!")
+        from OpenGL import EGL
+        self.EGL = EGL
+
+        self.display = EGL.eglGetDisplay(EGL.EGL_DEFAULT_DISPLAY)
+        major, minor = EGL.EGLint(), EGL.EGLint()
+        if not EGL.eglInitialize(self.display, ctypes.pointer(major), ctypes.pointer(minor)):
+            raise RuntimeError("Can't initialize EGL!")
+        attributes = (EGL.EGLint * 7)(EGL.EGL_SURFACE_TYPE, EGL.EGL_PBUFFER_BIT,
+                                      EGL.EGL_RENDERABLE_TYPE, EGL.EGL_OPENGL_BIT,
+                                      EGL.EGL_DEPTH_SIZE, 24, EGL.EGL_NONE)
+        config = EGL.EGLConfig()
+        nconfigs = EGL.EGLint()
+        EGL.eglChooseConfig(self.display, attributes, ctypes.pointer(config), 1,
+                            ctypes.pointer(nconfigs))
+        EGL.eglBindAPI(EGL.EGL_OPENGL_API)
+        # there may be no matching config, we don't need one (EGL_NO_CONFIG_KHR):
+        config = config if nconfigs.value else EGL.EGLConfig()
+        self.context = EGL.eglCreateContext(self.display, config, EGL.EGL_NO_CONTEXT, None)
+        if not EGL.eglMakeCurrent(self.display, EGL.EGL_NO_SURFACE, EGL.EGL_NO_SURFACE, self.context):
+            raise RuntimeError("Can't make the EGL context current!")
+
+        # without a surface we need our own color and depth buffer:
+        self.framebuffer = glGenFramebuffers(1)
+        glBindFramebuffer(GL_FRAMEBUFFER, self.framebuffer)
+        self.renderbuffers = glGenRenderbuffers(2)
+        glBindRenderbuffer(GL_RENDERBUFFER, self.renderbuffers[0])
+        glRenderbufferStorage(GL_RENDERBUFFER, GL_RGBA8, width, height)
+        glFramebufferRenderbuffer(GL_FRAMEBUFFER, GL_COLOR_ATTACHMENT0, GL_RENDERBUFFER,
+                                  self.renderbuffers[0])
+        glBindRenderbuffer(GL_RENDERBUFFER, self.renderbuffers[1])
+        glRenderbufferStorage(GL_RENDERBUFFER, GL_DEPTH_COMPONENT24, width, height)
+        glFramebufferRenderbuffer(GL_FRAMEBUFFER, GL_DEPTH_ATTACHMENT, GL_RENDERBUFFER,
+                                  self.renderbuffers[1])
+        if glCheckFramebufferStatus(GL_FRAMEBUFFER) != GL_FRAMEBUFFER_COMPLETE:
+            raise RuntimeError("The offscreen framebuffer is incomplete!")
+
+        self.width = width
+        self.height = height
+
+    def release(self):
+        glDeleteFramebuffers(1, [self.framebuffer])
+        glDeleteRenderbuffers(2, self.renderbuffers)
+        EGL = self.EGL
+        EGL.eglMakeCurrent(self.display, EGL.EGL_NO_SURFACE, EGL.EGL_NO_SURFACE, EGL.EGL_NO_CONTEXT)
+        EGL.eglDestroyContext(self.display, self.context)
+        EGL.eglTerminate(self.display)
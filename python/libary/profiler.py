@@ -0,0 +1,144 @@
+import cProfile
+import time
+import warnings
+import numpy as np
+
+
+class Stage(object):
+    """
+    Timer of one stage of the frame, use it as: with profiler.stage("name"):
+    the time is added to the stage's time of the current frame, so a stage
+    can run several times per frame (NaN means it didn't run yet)!
+    """
+    __slots__ = ("times", "column", "start")
+
+    def __init__(self, times, column):
+        self.times = times
+        self.column = column
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *args):
+        elapsed = time.perf_counter() - self.start
+        previous = self.times[self.column]
+        self.times[self.column] = elapsed if previous != previous else previous + elapsed
+
+
+class FrameProfiler(object):
+    """
+    Records the time of named stages (see stage) and of the whole frame for
+    the last history frames in a ring buffer, endFrame must be called once
+    per frame (Window.swapBuffers does it). A stage which didn't run in a
+    frame is recorded as NaN, so it doesn't pull its percentiles down.
+    A cProfile capture of the next frames can be started with startCapture,
+    the frame time and the stages' times can be exported with exportCSV!
+    """
+    def __init__(self, history=1000, maxStages=32):
+        self.history = history
+        self.maxStages = maxStages
+        # one row per frame: the stages' times and the frame time (last column):
+        self.samples = np.zeros((history, maxStages + 1))
+        self.frames = 0
+        self.names = []
+        self.stages = {}
+        # the stages' times of the current frame:
+        self.current = [np.nan] * maxStages
+        self.lastFrameEnd = None
+        # the running cProfile capture:
+        self.profile = None
+        self.profileFrames = 0
+        self.profilePath = None
+
+    def stage(self, name):
+        """Returns the timer of the stage name, created on the first call"""
+        stage = self.stages.get(name)
+        if stage is None:
+            if len(self.names) == self.maxStages:
+                raise ValueError(f"FrameProfiler supports at most {self.maxStages} stages!")
+            stage = Stage(self.current, len(self.names))
+            self.stages[name] = stage
+            self.names.append(name)
+        return stage
+
+    def endFrame(self):
+        """
+        Records the current frame and starts the next one.
+        --------------------------------------------------------------------
+        Returns the path of the cProfile capture if this frame finished it,
+        otherwise None!
+        """
+        now = time.perf_counter()
+        if self.lastFrameEnd is not None:
+            row = self.samples[self.frames % self.history]
+            row[:-1] = self.current
+            row[-1] = now - self.lastFrameEnd
+            self.frames += 1
+        # the stages keep a reference to the list, so it's cleared in place:
+        self.current[:] = [np.nan] * self.maxStages
+        self.lastFrameEnd = now
+
+        if self.profile is not None:
+            self.profileFrames -= 1
+            if self.profileFrames <= 0:
+                return self.stopCapture()
+        return None
+
+    def recorded(self):
+        """
+        Returns the names of the columns (the stages and "frame") and the
+        recorded frames (oldest first) as array of shape (n, columns) in ms,
+        NaN where a stage didn't run!
+        """
+        n = min(self.frames, self.history)
+        rows = np.roll(self.samples, -(self.frames % self.history), axis=0)[-n:] if n else self.samples[:0]
+        columns = list(range(len(self.names))) + [self.maxStages]
+        return self.names + ["frame"], rows[:, columns] * 1000
+
+    def percentiles(self, q=(50, 95, 99)):
+        """
+        Returns the percentiles q in ms of the frame time and of each stage
+        by name, only the frames in which a stage ran count for it (NaN if
+        it didn't run at all)!
+        """
+        names, rows = self.recorded()
+        if len(rows) == 0:
+            return {name: np.zeros(len(q)) for name in names}
+        with warnings.catch_warnings():
+            # a stage which never ran is an all NaN column:
+            warnings.simplefilter("ignore", RuntimeWarning)
+            values = np.nanpercentile(rows, q, axis=0)
+        return {name: values[:, i] for i, name in enumerate(names)}
+
+    def summary(self):
+        """Returns one line per stage (and the frame) with p50, p95 and p99 in ms"""
+        lines = []
+        for name, (p50, p95, p99) in self.percentiles().items():
+            lines.append(f"{name}: p50 {p50:.2f} p95 {p95:.2f} p99 {p99:.2f} ms")
+        return lines
+
+    def exportCSV(self, path):
+        """
+        Writes the recorded frames to path, one row per frame, times in ms
+        (nan if a stage didn't run)!
+        """
+        names, rows = self.recorded()
+        np.savetxt(path, rows, fmt="%.4f", delimiter=",", header=",".join(names), comments="")
+
+    def startCapture(self, nframes=60, path=None):
+        """Records the next nframes frames with cProfile into path (a .prof file)"""
+        if self.profile is not None:
+            return
+        self.profilePath = path or time.strftime("frames_%Y%m%d_%H%M%S.prof")
+        self.profileFrames = nframes
+        self.profile = cProfile.Profile()
+        self.profile.enable()
+
+    def stopCapture(self):
+        """Ends the cProfile capture and writes it, returns the path of the .prof file"""
+        self.profile.disable()
+        self.profile.dump_stats(self.profilePath)
+        self.profile = None
+        return self.profilePath
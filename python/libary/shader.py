@@ -1,21 +1,44 @@
 from OpenGL.GL import *
+from OpenGL.error import GLError, NullFunctionError
+import ctypes
+import hashlib
+import os
 import glm
+import numpy as np
+
+from glstate import state
 
 class Shader():
 
+    # uniform writes of all shaders since Shader.resetCounters:
+    uniformWrites = 0
+    uniformsSkipped = 0
+
+    # linked programs are stored here and loaded on the next start instead
+    # of compiling them again, None to always compile:
+    cacheDir = os.path.join(os.path.expanduser("~"), ".cache", "libary", "shaders")
+    # programs loaded from/compiled and stored in the cache since the start:
+    cacheHits = 0
+    cacheMisses = 0
+
     def __init__(self, vs_filename, fs_filename):
         # get vertex shader source code:
         with open(vs_filename, "r") as file:
             vs_source = file.read()
 
-        print(vs_source)
-
         # get fragment shader source code:
         with open(fs_filename, "r") as file:
             fs_source = file.read()
 
-        print(fs_source)
+        self.id = glCreateProgram()
+        cachePath = Shader.cachePath(vs_source, fs_source)
+        if not self.loadBinary(cachePath):
+            self.compile(vs_source, fs_source, retrievable=cachePath is not None)
+            self.saveBinary(cachePath)
 
+        self.findUniforms()
+
+    def compile(self, vs_source, fs_source, retrievable=False):
         # compile shaders:
         vs = glCreateShader(GL_VERTEX_SHADER)
         glShaderSource(vs, vs_source)
@@ -30,35 +53,191 @@ class Shader():
             raise RuntimeError(glGetShaderInfoLog(fs))
 
         # link shaders, create program:
-        self.id = glCreateProgram()
         glAttachShader(self.id, vs)
         glAttachShader(self.id, fs)
+        if retrievable:
+            # we want to get the binary of the linked program for the cache
+            # (needs OpenGL 4.1 or ARB_get_program_binary):
+            try:
+                glProgramParameteri(self.id, GL_PROGRAM_BINARY_RETRIEVABLE_HINT, GL_TRUE)
+            except (GLError, NullFunctionError):
+                pass
         glLinkProgram(self.id)
         if glGetProgramiv(self.id, GL_LINK_STATUS) != GL_TRUE:
             raise RuntimeError(glGetProgramInfoLog(self.id))
 
         # shaders aren't needed anymore, free the resources:
+        glDetachShader(self.id, vs)
+        glDetachShader(self.id, fs)
         glDeleteShader(vs)
         glDeleteShader(fs)
 
+    def cachePath(vs_source, fs_source):
+        """
+        Class Method!
+        Returns the file of the cached program or None if there is no cache,
+        binaries only fit to the driver they were made by, so the driver is
+        part of the key as well as the sources!
+        """
+        if Shader.cacheDir is None:
+            return None
+        try:
+            if glGetIntegerv(GL_NUM_PROGRAM_BINARY_FORMATS) == 0:
+                return None
+        except (GLError, NullFunctionError):
+            # neither OpenGL 4.1 nor ARB_get_program_binary:
+            return None
+        key = hashlib.sha256()
+        for part in (vs_source.encode(), fs_source.encode(), glGetString(GL_VENDOR),
+                     glGetString(GL_RENDERER), glGetString(GL_VERSION)):
+            key.update(part + b"\0")
+        return os.path.join(Shader.cacheDir, key.hexdigest() + ".bin")
+
+    def loadBinary(self, cachePath):
+        """Returns True if the program was loaded from the cache"""
+        if cachePath is None or not os.path.exists(cachePath):
+            return False
+        with open(cachePath, "rb") as file:
+            data = file.read()
+        # the first 4 bytes are the format of the binary:
+        binaryFormat = int.from_bytes(data[:4], "little")
+        binary = data[4:]
+        try:
+            glProgramBinary(self.id, binaryFormat, binary, len(binary))
+            loaded = glGetProgramiv(self.id, GL_LINK_STATUS) == GL_TRUE
+        except (GLError, NullFunctionError):
+            # a format the driver doesn't know (anymore):
+            loaded = False
+        if not loaded:
+            # e.g. the driver was updated without changing its version:
+            os.remove(cachePath)
+            glDeleteProgram(self.id)
+            self.id = glCreateProgram()
+            return False
+        Shader.cacheHits += 1
+        return True
+
+    def saveBinary(self, cachePath):
+        if cachePath is None:
+            return
+        try:
+            length = glGetProgramiv(self.id, GL_PROGRAM_BINARY_LENGTH)
+            if length == 0:
+                return
+            binary = (ctypes.c_ubyte * length)()
+            binaryFormat = GLenum(0)
+            glGetProgramBinary(self.id, length, None, binaryFormat, binary)
+        except (GLError, NullFunctionError):
+            # the program is linked, it just won't be cached:
+            return
+        os.makedirs(Shader.cacheDir, exist_ok=True)
+        # write to a temporary file first, another process may read it:
+        tmpPath = f"{cachePath}.{os.getpid()}.tmp"
+        with open(tmpPath, "wb") as file:
+            file.write(binaryFormat.value.to_bytes(4, "little") + bytes(binary))
+        os.replace(tmpPath, cachePath)
+        Shader.cacheMisses += 1
+
+    def findUniforms(self):
+        # the locations of all active uniforms, looked up once after linking:
+        self.locations = {}
+        for i in range(glGetProgramiv(self.id, GL_ACTIVE_UNIFORMS)):
+            name = glGetActiveUniform(self.id, i)[0].decode()
+            location = glGetUniformLocation(self.id, name)
+            self.locations[name] = location
+            if name.endswith("[0]"):
+                # arrays can be set by their name, e.g: "heights"
+                self.locations[name[:-3]] = location
+        # the last value written to each uniform:
+        self.values = {}
+
     def use(self):
         """Always have a program in use before calling any glUniform...!"""
-        glUseProgram(self.id)
+        state.useProgram(self.id)
+
+    def changed(self, name, value):
+        """
+        Returns the location of the uniform if value differs from the last
+        value written to it, otherwise None and the write can be skipped!
+        """
+        if self.values.get(name) == value:
+            Shader.uniformsSkipped += 1
+            return None
+        self.values[name] = value
+        Shader.uniformWrites += 1
+        # -1 for names which aren't active uniforms, glUniform ignores them:
+        return self.locations.get(name, -1)
 
     # e.g in the shader write: uniform int index; -> name = "index"
     def setInt(self, name, x):
         """Always have a program in use before calling this function!"""
-        glUniform1i(glGetUniformLocation(self.id, name), x)
+        location = self.changed(name, x)
+        if location is not None:
+            glUniform1i(location, x)
 
     def setFloat(self, name, x):
         """Always have a program in use before calling this function!"""
-        glUniform1f(glGetUniformLocation(self.id, name), x)
+        location = self.changed(name, x)
+        if location is not None:
+            glUniform1f(location, x)
+
 
+    def setFloats(self, name, values):
+        """
+        Writes all values to the uniform array name at once, e.g: in the
+        shader write: uniform float heights[8]; -> name = "heights"
+        Always have a program in use before calling this function!
+        """
+        values = np.ascontiguousarray(values, dtype=np.float32)
+        location = self.changed(name, values.tobytes())
+        if location is not None:
+            glUniform1fv(location, len(values), values)
 
     def setVector(self, name, x, y, z):
         """Always have a program in use before calling this function!"""
-        glUniform3f(glGetUniformLocation(self.id, name), x, y, z)
+        location = self.changed(name, (x, y, z))
+        if location is not None:
+            glUniform3f(location, x, y, z)
+
+    def setVector4(self, name, x, y, z, w):
+        """Always have a program in use before calling this function!"""
+        location = self.changed(name, (x, y, z, w))
+        if location is not None:
+            glUniform4f(location, x, y, z, w)
 
     def setMatrix(self, name, matrix):
         """Always have a program in use before calling this function!"""
-        glUniformMatrix4fv(glGetUniformLocation(self.id, name), 1, GL_FALSE, glm.value_ptr(matrix))
+        location = self.changed(name, glm.mat4(matrix))
+        if location is not None:
+            glUniformMatrix4fv(location, 1, GL_FALSE, glm.value_ptr(matrix))
+
+    def set(self, name, value):
+        """
+        Calls the setter which fits to value (int, float, 3 or 4 floats,
+        glm.mat4 or a numpy array for a float array)
+        """
+        if isinstance(value, glm.mat4):
+            self.setMatrix(name, value)
+        elif isinstance(value, np.ndarray):
+            self.setFloats(name, value)
+        elif isinstance(value, (list, tuple)):
+            if len(value) == 3:
+                self.setVector(name, *value)
+            else:
+                self.setVector4(name, *value)
+        elif isinstance(value, float):
+            self.setFloat(name, value)
+        else:
+            self.setInt(name, value)
+
+    def resetCounters():
+        """
+        Class Method!
+        Returns the uniform writes and the skipped (redundant) writes since
+        the last call and starts counting again!
+        """
+        counters = {"uniformWrites": Shader.uniformWrites,
+                    "uniformsSkipped": Shader.uniformsSkipped}
+        Shader.uniformWrites = 0
+        Shader.uniformsSkipped = 0
+        return counters
@@ -3,7 +3,14 @@ out vec4 fragColor;
 
 in vec4 color;
 
+// e.g. to draw outlines in one color without changing the vertex colors:
+uniform int useOverrideColor;
+uniform vec4 overrideColor;
+
 void main()
 {
-  fragColor = color;
+  if (useOverrideColor == 1)
+    fragColor = overrideColor;
+  else
+    fragColor = color;
 }
@@ -0,0 +1,59 @@
+#version 330 core
+layout(location = 0) in vec3 aPos;
+layout(location = 1) in vec4 aColor;
+
+uniform mat4 model;
+uniform mat4 view;
+uniform mat4 projection;
+
+// bending process in [0, 1] (see Backbone.interpolate), the number of
+// circles and the radius of the fully bent backbone of the SoftRobot:
+uniform float p;
+uniform int n;
+uniform float bendingRadius;
+
+out vec4 color;
+
+const float PI = 3.14159265358979;
+
+// backbone position i for the bending process p:
+vec3 backbone(int i)
+{
+  if (i <= 0)
+    return vec3(0.0);
+  float y_s = float(i) * bendingRadius * PI / 2.0 / float(n - 1);
+  float t_end = 3.0 * PI / 2.0 + float(i) * (PI / 2.0) / float(n - 1);
+  float x_e = bendingRadius * sin(t_end) + bendingRadius;
+  float y_e = bendingRadius * cos(t_end);
+  float a = x_e / sqrt(y_s * y_s - y_e * y_e);
+  float t_s = PI / 2.0;
+  float t_e = asin(y_e / y_s);
+  float t = t_s + clamp(p, 0.0, 1.0) * (t_e - t_s);
+  return vec3(a * y_s * cos(t), y_s * sin(t), 0.0);
+}
+
+void main()
+{
+  // the unbent circle i lies at height y = i * spacing:
+  float spacing = bendingRadius * PI / 2.0 / float(n - 1);
+  int i = int(round(aPos.y / spacing));
+  vec3 center = backbone(i);
+  vec3 local = vec3(aPos.x, 0.0, aPos.z);
+
+  if (i > 0) {
+    // normalized gradient of the backbone at the circle:
+    vec3 v = normalize(i < n - 1 ? backbone(i + 1) - backbone(i - 1) : center - backbone(i - 1));
+    // rotate (0, 1, 0) onto v, axis = cross((0, 1, 0), v):
+    vec3 axis = vec3(v.z, 0.0, -v.x);
+    float len = length(axis);
+    if (len > 1e-6) {
+      axis /= len;
+      float angle = acos(clamp(abs(v.y), 0.0, 1.0));
+      // Rodrigues' rotation formula:
+      local = local * cos(angle) + cross(axis, local) * sin(angle)
+              + axis * dot(axis, local) * (1.0 - cos(angle));
+    }
+  }
+  gl_Position = projection * view * model * vec4(center + local, 1.0);
+  color = aColor;
+}
@@ -0,0 +1,115 @@
+from OpenGL.GL import *
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import os
+import numpy as np
+from PIL import Image
+
+from utils import fullpath
+from glstate import state
+
+
+def decode(path):
+    """
+    Returns the pixels of the image at path as uint8 array of shape (h, w, 4),
+    always RGBA, drivers store RGB textures as RGBA anyway and would have
+    to convert them while we wait!
+    """
+    return np.asarray(Image.open(path).convert("RGBA"))
+
+
+def upload(pixels, wrap=GL_REPEAT):
+    """
+    Creates a texture from RGBA pixels (first row is the top of the image),
+    the mipmaps are generated by the GPU.
+    --------------------------------------------------------------------
+    Returns the id of the texture!
+    """
+    # OpenGL's first row is the bottom of the image:
+    pixels = np.ascontiguousarray(pixels[::-1])
+    textureID = glGenTextures(1)
+    glPixelStorei(GL_UNPACK_ALIGNMENT, 1)
+    state.bindTexture(GL_TEXTURE_2D, textureID)
+    # set texture wrapping parameters
+    glTexParameterf(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, wrap)
+    glTexParameterf(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, wrap)
+    # set texture filtering parameters
+    glTexParameterf(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
+    glTexParameterf(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_LINEAR_MIPMAP_LINEAR)
+    glTexImage2D(GL_TEXTURE_2D, 0, GL_RGBA, pixels.shape[1], pixels.shape[0], 0,
+                 GL_RGBA, GL_UNSIGNED_BYTE, pixels)
+    glGenerateMipmap(GL_TEXTURE_2D)
+    state.bindTexture(GL_TEXTURE_2D, 0)
+    return textureID
+
+
+class TextureCache(object):
+    """
+    Loads every image once, no matter how many meshes use it: the decoded
+    pixels and the textures are kept by the full path of the image.
+    Images can be decoded by a thread pool (see preload) while the GL
+    thread does something else, e.g. compiling the shaders, only the upload
+    to the GPU has to happen in the GL thread (see get).
+    If diskCache is a directory, the decoded pixels are saved there as .npy
+    files which load faster than decoding a .png or .jpg again on the
+    next start (an image which changed is decoded again)!
+    """
+    def __init__(self, workers=4, diskCache=None):
+        self.workers = workers
+        self.diskCache = diskCache
+        self.pool = None
+        # path -> Future of the decoded pixels:
+        self.pending = {}
+        # path -> texture id:
+        self.textures = {}
+
+    def path(self, imgName):
+        return os.path.abspath(fullpath(imgName))
+
+    def preload(self, imgNames):
+        """Starts decoding the images in the background, returns immediately"""
+        if self.pool is None:
+            self.pool = ThreadPoolExecutor(self.workers)
+        for imgName in imgNames:
+            path = self.path(imgName)
+            if path not in self.pending:
+                self.pending[path] = self.pool.submit(self.decode, path)
+
+    def pixels(self, imgName):
+        """
+        Returns the decoded pixels of the image, waits if it's decoded
+        in the background and decodes it right now if it wasn't preloaded!
+        """
+        path = self.path(imgName)
+        if path not in self.pending:
+            self.preload([imgName])
+        return self.pending[path].result()
+
+    def get(self, imgName):
+        """Returns the texture id of the image, it's uploaded on the first call"""
+        path = self.path(imgName)
+        if path not in self.textures:
+            self.textures[path] = upload(self.pixels(imgName))
+        return self.textures[path]
+
+    def decode(self, path):
+        if self.diskCache is None:
+            return decode(path)
+        # the cached file belongs to this version of the image:
+        info = os.stat(path)
+        key = hashlib.sha1(f"{path}:{info.st_mtime_ns}:{info.st_size}".encode()).hexdigest()
+        cachePath = os.path.join(self.diskCache, key + ".npy")
+        if os.path.exists(cachePath):
+            return np.load(cachePath)
+        pixels = decode(path)
+        os.makedirs(self.diskCache, exist_ok=True)
+        # write to a temporary file first, another process may read it:
+        tmpPath = f"{cachePath}.{os.getpid()}.tmp"
+        with open(tmpPath, "wb") as file:
+            np.save(file, pixels)
+        os.replace(tmpPath, cachePath)
+        return pixels
+
+
+# there is one OpenGL context, so one cache for all meshes:
+cache = TextureCache()
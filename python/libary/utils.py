@@ -1,5 +1,13 @@
 import serial
 import sys, os
+import time
+import numpy as np
+
+# the io helpers are shared with the mylib package (python/mylib), so like
+# libary itself python/ must be on sys.path (see libary_examples):
+from mylib.myio.mybuffer import ChannelBuffer
+from mylib.myio.mycsv import CsvStream
+from mylib.myio.mymetrics import PortMetrics, garbage_cause, SHORT, NON_FLOAT, DECODE
 
 class Port(serial.Serial):
 
@@ -11,6 +19,10 @@ class Port(serial.Serial):
                                parity=serial.PARITY_NONE,
                                stopbits=serial.STOPBITS_ONE,
                                timeout=timeout)
+        # bytes of incomplete lines are kept here between read_batch calls:
+        self.csv_stream = CsvStream()
+        # health numbers instead of printing every garbage line:
+        self.metrics = PortMetrics()
 
     def read_csv(self, list_of_lists):
         """
@@ -19,25 +31,11 @@ class Port(serial.Serial):
         If the arduino sends us always 8 csv sensor values we can save the
         first 3 sensor values in the list_of_lists!
         --------------------------------------------------------------------
-        Returns True if reading attempt was successful, prints error message
-        and False if something went wrong!
+        Returns True if reading attempt was successful and False if something
+        went wrong (counted in self.metrics)!
         """
-        try:
-            bytes = self.readline()
-            line = bytes.decode("ascii")[:-2]
-            str_values = line.split(",")
-        except Exception as e:
-            print(e, "\nbytes:", bytes)
-            return False
-
-        if len(str_values) < len(list_of_lists):
-            print("Garbage Value: " + line + " less data received than expected!")
-            return False
-        try:
-            for value in str_values:
-                float(value)
-        except ValueError:
-            print("Garbage Value: " + line + " received, which cannot be converted to float!")
+        str_values = self.read_values(len(list_of_lists))
+        if str_values is None:
             return False
 
         for i, a_list in enumerate(list_of_lists):
@@ -53,30 +51,93 @@ class Port(serial.Serial):
         in the mygraph module a format like: [bar0, bar1, bar2,...] will be expected
         in real_time_data_bar_chart's update_func!
         --------------------------------------------------------------------
-        Returns True if reading attempt was successful, prints error message
-        and False if something went wrong!
+        Returns True if reading attempt was successful and False if something
+        went wrong (counted in self.metrics)!
         """
-        try:
-            bytes = self.readline()
-            line = bytes.decode("ascii")[:-2]
-            str_values = line.split(",")
-        except Exception as e:
-            print(e, "\nbytes:", bytes)
+        str_values = self.read_values(number_of_bars)
+        if str_values is None:
             return False
 
-        if len(str_values) < number_of_bars:
-            print("Garbage Value: " + line + " less data received than expected!")
-            return False
+        for i in range(number_of_bars):
+            a_list[i] = float(str_values[i])
+        return True
+
+    def read_values(self, n_values):
+        """
+        Reads a line and checks that it has at least n_values csv values which
+        can be converted to float, otherwise it is counted as garbage in self.metrics!
+        --------------------------------------------------------------------
+        Returns the csv values of the line as strings or None for garbage
+        (or if nothing arrived within timeout)!
+        """
+        self.metrics.set_in_waiting(self.in_waiting)
+        start = time.perf_counter()
+        bytes = self.readline()
+        self.metrics.add_latency(time.perf_counter() - start)
+        self.metrics.add_frames(0, len(bytes))
+        if not bytes:
+            # readline timed out, nothing arrived (that's no garbage):
+            self.metrics.maybe_log()
+            return None
+        try:
+            line = bytes.decode("ascii")[:-2]
+        except UnicodeDecodeError:
+            self.metrics.add_garbage(DECODE, bytes)
+            self.metrics.maybe_log()
+            return None
+        str_values = line.split(",")
+        if len(str_values) < n_values:
+            self.metrics.add_garbage(SHORT, line)
+            self.metrics.maybe_log()
+            return None
         try:
             for value in str_values:
                 float(value)
         except ValueError:
-            print("Garbage Value: " + line + " received, which cannot be converted to float!")
-            return False
+            self.metrics.add_garbage(NON_FLOAT, line)
+            self.metrics.maybe_log()
+            return None
+        self.metrics.add_frames(1, 0)
+        self.metrics.maybe_log()
+        return str_values
 
-        for i in range(number_of_bars):
-            a_list[i] = float(str_values[i])
-        return True
+    def read_batch(self, n_channels):
+        """
+        Reads everything which is waiting in the input buffer with a single
+        read and parses all complete lines at once, an incomplete line at the
+        end is carried over to the next call instead of being thrown away.
+        If nothing is waiting we wait for at most timeout seconds.
+        --------------------------------------------------------------------
+        Returns a numpy array of shape (n_frames, n_channels) and the number
+        of rejected lines!
+        """
+        waiting = self.in_waiting
+        self.metrics.set_in_waiting(waiting)
+        start = time.perf_counter()
+        n_bytes = 0
+        if waiting == 0:
+            # wait for at most timeout seconds till something arrives:
+            n_bytes = self.csv_stream.fill(self.readinto, 1) or 0
+            waiting = self.in_waiting
+        n_bytes += self.csv_stream.fill(self.readinto, waiting) or 0
+        self.metrics.add_latency(time.perf_counter() - start)
+        frames, rejected = self.csv_stream.parse(n_channels)
+        self.metrics.add_frames(len(frames), n_bytes)
+        for line in self.csv_stream.rejected_lines:
+            self.metrics.add_garbage(garbage_cause(line, n_channels), line)
+        self.metrics.maybe_log()
+        return frames, rejected
+
+    def read_into(self, history):
+        """
+        Reads a batch of frames (see read_batch) and appends them to
+        history, a ChannelBuffer which keeps a bounded amount of frames!
+        --------------------------------------------------------------------
+        Returns the number of frames appended to history!
+        """
+        frames, rejected = self.read_batch(history.n_channels)
+        history.append(frames)
+        return len(frames)
 
 def fullpath(filename):
     return os.path.join(os.path.dirname(sys.path[0]), "libary", filename)
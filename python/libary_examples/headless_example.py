@@ -0,0 +1,80 @@
+import sys, os
+sys.path.append(os.path.join(os.path.dirname(sys.path[0]), "libary"))
+# utils uses the io helpers of mylib (python/mylib):
+sys.path.append(os.path.dirname(sys.path[0]))
+# must be imported before graphics, so OpenGL works without a display:
+import offscreen
+import glm
+import numpy as np
+import pygame
+from pygame.locals import *
+from PIL import Image
+
+from graphics import Window, BarPlot, SoftRobot, Label, HUD, Point
+from atlas import Atlas
+
+"""
+Renders the scene of the soft_robot_example without display (e.g. on a
+server without GPU), moves the camera with scripted key and mouse events,
+prints the frame times and the times of the stages, exports the stage
+times as headless.csv and saves the last frame as headless.png!
+"""
+
+window = Window(1280, 720, headless=True)
+
+barplot = BarPlot(Point(-0.9, 0.4, 0), 0.5, 0.5, 8, 1023)
+
+atlas = Atlas(["sensor.png"])
+hud = HUD(atlas, aspect=window.height / window.width)
+hud.addImage("sensor.png", 0.1, 0.1).move(-0.95, 0.3)
+readouts = []
+for i in range(8):
+    hud.addText(str(i), 0.05).move(-0.9 + 0.5 * (i + 1) / 8, 0.3)
+    readouts.append(hud.addText("", 0.03))
+    readouts[-1].move(-0.9 + 0.5 * (i + 1) / 8, 0.95)
+
+softrobot = SoftRobot(10, 1.5, 0.3, gpu_skinning=True)
+
+table = Label("wood.jpg", 2, 2)
+matrix = glm.rotate(glm.mat4(), glm.radians(-90.0), glm.vec3(1, 0, 0))
+matrix = glm.translate(matrix, glm.vec3(0, 0, -0.001))
+glm_positions = Point.Utils.to_glm_vec4_list(table.mesh.positions)
+table.mesh.updatePositions(Point.Utils.to_points_list([matrix * p for p in glm_positions]))
+
+profiler = window.profiler
+
+def render(frame):
+    # fake sensor values, a sine wave running over the bars:
+    sensor_values = 511 + 511 * np.sin(frame / 10 + np.arange(8))
+    with profiler.stage("updateBarHeights"):
+        barplot.updateBarHeights(sensor_values)
+    with profiler.stage("updateColors"):
+        softrobot.updateColors(barplot.normalizeValues(sensor_values))
+    with profiler.stage("readouts"):
+        for readout, value in zip(readouts, sensor_values):
+            readout.setText(int(value))
+    with profiler.stage("updateSkinVertices"):
+        softrobot.updateSkinVertices(0.5 + 0.5 * np.sin(frame / 20))
+
+    with profiler.stage("render"):
+        barplot.render(window)
+        softrobot.render(window)
+        table.render(window)
+        hud.render(window)
+
+# look down for 30 frames, then walk backwards (and up) for 60 frames:
+script = {frame: [pygame.event.Event(MOUSEMOTION, rel=(0, 2.5))] for frame in range(30)}
+script[30] = [pygame.event.Event(KEYDOWN, key=K_s)]
+script[90] = [pygame.event.Event(KEYUP, key=K_s)]
+
+nframes = 120
+frames, frameTimes = window.runScript(render, nframes, script, types=["PC", "PT", "PCSkin"],
+                                      capture=False)
+frameTimes = np.array(frameTimes[10:]) * 1000  # without the warm up
+print(f"{window.width}x{window.height}, {len(frameTimes)} frames: "
+      f"median {np.median(frameTimes):.2f} ms, p95 {np.percentile(frameTimes, 95):.2f} ms")
+print("\n".join(profiler.summary()))
+profiler.exportCSV("headless.csv")
+
+frames, _ = window.runScript(render, 1)
+Image.fromarray(frames[-1]).save("headless.png")
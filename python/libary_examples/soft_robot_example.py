@@ -1,69 +1,29 @@
 import sys, os
 sys.path.append(os.path.join(os.path.dirname(sys.path[0]), "libary"))
+# utils uses the io helpers of mylib (python/mylib):
+sys.path.append(os.path.dirname(sys.path[0]))
 import glm
 import time
-import threading
 from threading import Thread
 
-from graphics import Window, BarPlot, SoftRobot, Label, UI_Label, Point
-from utils import Port
-
-
-class Fifo:
-    """FIFO ... First In First Out buffer
-    in such a buffer the threads will temporaly store the data
-    the access is synchronized wich is needed when multiple threads accessing it
-    with Lock.acquire() and Lock.release() used internally we ensure that only
-    one thread at a time can access the fifo buffer -> no data corruption possible
-    """
-    def __init__(self):
-        self.data = []
-        self.lock = threading.Lock()
-
-    def has_item(self) -> bool:
-        return len(self.data) > 0
-
-    # a higher order function that executes an access function synchronized:
-    def synchronized_access(self, access_function, *args):
-        obj = None
-        try:
-            self.lock.acquire()
-            # here an error could be raised!
-            obj = access_function(*args)
-        except Exception as e:
-            print(e)
-        finally:
-            # make sure to release the lock even in error case or it will block forever!
-            self.lock.release()
-        return obj
-
-    def _clear_data(self):
-        self.data.clear()
-
-    def clear_data(self):
-        self.synchronized_access(self._clear_data)
-
-    def _push(self, data):
-        self.data.append(data)
-
-    def push(self, data):
-        self.synchronized_access(self._push, data)
-
-    def _pop(self):
-        return self.data.pop(0)
-
-    def pop(self) -> object:
-        return self.synchronized_access(self._pop)
+from graphics import Window, BarPlot, SoftRobot, Label, HUD, Point
+from atlas import Atlas
+from textures import cache
+from utils import Port, ChannelBuffer
+from channel import Channel, LATEST
 
 
 class ArduinoThread(Thread):
-    def __init__(self, buffer, port="COM3", baudrate=19200, nbars=8):
+    def __init__(self, channel, port="COM3", baudrate=19200, nbars=8, history_size=10000):
         Thread.__init__ (self)
         self.port = Port(port, baudrate=baudrate)
+        # print a health summary (frames/s, garbage lines,...) every 5 seconds:
+        self.port.metrics.log = print
         self.running = True
-        self.buffer = buffer
+        self.channel = channel
         self.nbars = nbars
-        self.temp = [0 for _ in range(nbars)]
+        # the last history_size frames, memory stays bounded however long we run:
+        self.history = ChannelBuffer(nbars, history_size)
 
     def run(self):
         last_update_time = time.time()
@@ -71,10 +31,9 @@ class ArduinoThread(Thread):
         arduino_update_time = 0.16
 
         while self.running:
-            start = time.time()
-            self.port.read_csv_for_bar(self.temp, self.nbars)
-            self.buffer.push(self.temp[:])
-            print("Aquisition time:", time.time() - start)
+            # only the newest frame of a batch is shown:
+            if self.port.read_into(self.history) > 0:
+                self.channel.push(self.history.last(1)[0].tolist())
             if (time.time() - last_update_time) > arduino_update_time:
                 continue
             else:
@@ -84,36 +43,43 @@ class ArduinoThread(Thread):
         self.running = False
 
 
+startup_time = time.perf_counter()
+# decode the images in the background while the window is created and the
+# shaders are compiled:
+cache.preload(["wood.jpg", "sensor.png", "start.png", "stop.png", "hide.png", "somap.png"])
 window = Window()
 
 
 #-------------create the barplot and label it----------------
 barplot = BarPlot(Point(-0.9, 0.4, 0), 0.5, 0.5, 8, 1023)
 
+# all images and the glyphs of the text in one texture, so every label,
+# button and readout is drawn with one draw call:
+atlas = Atlas(["sensor.png", "start.png", "stop.png", "hide.png", "somap.png"])
+hud = HUD(atlas, aspect=window.height / window.width)
+
+sensor_label = hud.addImage("sensor.png", 0.1, 0.1)
+sensor_label.move(-0.95, 0.3)
 x_labels = []
-x_labels.append(UI_Label("sensor.png", 0.1, 0.1))
-x_labels[0].move(-0.95, 0.3)
+readouts = []
 for i in range(8):
-    x_labels.append(UI_Label(f"{i}.png", 0.08, 0.08))
-    if i == 0:
-        x_labels[-1].move(-0.9 + 0.06, 0.3)
-    elif i >= 4:
-        x_labels[-1].move(-0.9 + 0.06 * (i + 1) + 0.01 * (i - 3), 0.3)
-    else:
-        x_labels[-1].move(-0.9 + 0.06 * (i + 1), 0.3)
-
-y_labels = [UI_Label("200.png", 0.06, 0.06),
-            UI_Label("400.png", 0.06, 0.06),
-            UI_Label("600.png", 0.06, 0.06),
-            UI_Label("800.png", 0.06, 0.06),
-            UI_Label("1000.png", 0.06, 0.06)]
-
-y_labels[0].move(-0.96, 0.3 + 0.20)
-for i in range(1, 5):
-    y_labels[i].move(-0.96, 0.3 + 0.10 * (i + 2))
+    # the bars stand on the ticks of the x axis:
+    x = -0.9 + 0.5 * (i + 1) / 8
+    x_labels.append(hud.addText(str(i), 0.05))
+    x_labels[-1].move(x, 0.3)
+    # the live sensor values above the bars:
+    readouts.append(hud.addText("", 0.03))
+    readouts[-1].move(x, 0.95)
+
+y_labels = []
+for i, value in enumerate(range(200, 1001, 200)):
+    y_labels.append(hud.addText(str(value), 0.04))
+    y_labels[-1].move(-0.96, 0.4 + 0.1 * (i + 1))
+barplot_labels = [sensor_label] + x_labels + y_labels + readouts
 #------------------------------------------------------------
 
-softrobot = SoftRobot(10, 1.5, 0.3)
+# the bending is calculated by the vertex shader, no vertex uploads per frame:
+softrobot = SoftRobot(10, 1.5, 0.3, gpu_skinning=True)
 
 table = Label("wood.jpg", 2, 2)
 # build matrix and get positions:
@@ -131,7 +97,7 @@ for glm_position in glm_positions:
 new_positions = Point.Utils.to_points_list(new_glm_positions)
 table.mesh.updatePositions(new_positions)
 
-logo = UI_Label("somap.png", 0.2, 0.2)
+logo = hud.addImage("somap.png", 0.2, 0.2)
 logo.move(0.9, 0.9)
 # set the function which should be executed on click:
 logo.onClick(lambda: print("Somap stands for soft matter physics!"))
@@ -141,20 +107,21 @@ p = 0
 step = 0.01
 flag = True
 
-buffer = Fifo()
-arduinoThread = ArduinoThread(buffer)
+# the render loop only shows the newest frame, older ones are dropped:
+channel = Channel(policy=LATEST)
+arduinoThread = ArduinoThread(channel)
 
-start = UI_Label("start.png", 0.2, 0.2)
+start = hud.addImage("start.png", 0.2, 0.2)
 start.move(-0.9, -0.9)
 start.onClick(arduinoThread.start)
 window.enableClickDetection(start)
 
-stop = UI_Label("stop.png", 0.2, 0.2)
+stop = hud.addImage("stop.png", 0.2, 0.2)
 stop.move(-0.7, -0.9)
 stop.onClick(arduinoThread.stop)
 window.enableClickDetection(stop)
 
-hide = UI_Label("hide.png", 0.2, 0.2)
+hide = hud.addImage("hide.png", 0.2, 0.2)
 class myFlag(object):
     def __init__(self, state):
         self.state = state
@@ -168,39 +135,32 @@ hide.move(-0.5, -0.9)
 hide.onClick(draw_flag.flip)
 window.enableClickDetection(hide)
 
-sensor_values = [0 for _ in range(barplot.nbars)]
-old_sensor_values = sensor_values
-values_have_changed = False
+seen_version = 0
+# F1 shows the times of these stages, F2 records a cProfile capture and F3
+# exports the stage times as CSV (see Window):
+profiler = window.profiler
+print(f"Startup took {time.perf_counter() - startup_time:.3f} s")
 
 while True:
     window.clearBufferBits()
 
-    try:
-        sensor_values = buffer.pop()
-        for sensor_value, old_sensor_value in zip(sensor_values, old_sensor_values):
-            if sensor_value != old_sensor_value:
-                values_have_changed = True
-                break
-    except Exception as e:
-        pass
-
-    if values_have_changed:
-        print(sensor_values)
-        barplot.updateBarHeights(sensor_values)
-        softrobot.updateColors(barplot.normalizeValues(sensor_values))
-        old_sensor_values = sensor_values
-        values_have_changed = False
-
-    if draw_flag.state:
-        barplot.render(window)
-
-        for label in x_labels:
-            label.render(window)
-        for label in y_labels:
-            label.render(window)
-
-    softrobot.updateSkinVertices(p)
-    softrobot.render(window)
+    # only update if a new frame arrived since the last one we have seen:
+    with profiler.stage("poll"):
+        new_frame = channel.version != seen_version
+        if new_frame:
+            seen_version, sensor_values = channel.peek()
+            print(sensor_values)
+    if new_frame:
+        with profiler.stage("updateBarHeights"):
+            barplot.updateBarHeights(sensor_values)
+        with profiler.stage("updateColors"):
+            softrobot.updateColors(barplot.normalizeValues(sensor_values))
+        with profiler.stage("readouts"):
+            for readout, value in zip(readouts, sensor_values):
+                readout.setText(int(value))
+
+    with profiler.stage("updateSkinVertices"):
+        softrobot.updateSkinVertices(p)
 
     if p <= 0:
         flag = True
@@ -214,11 +174,14 @@ while True:
         else:
             p -= step
 
-    table.render(window)
-    logo.render(window)
-    start.render(window)
-    stop.render(window)
-    hide.render(window)
+    with profiler.stage("render"):
+        if draw_flag.state:
+            barplot.render(window)
+        for label in barplot_labels:
+            label.visible = draw_flag.state
+        softrobot.render(window)
+        table.render(window)
+        hud.render(window)
 
-    window.handleEvents(["PC", "PT"])
+    window.handleEvents(["PC", "PT", "PCSkin"])
     window.swapBuffers()
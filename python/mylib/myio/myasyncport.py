@@ -0,0 +1,111 @@
+import asyncio
+import serial
+
+from mylib.myio.mycsv import CsvStream
+from mylib.myio.myframe import FrameDecoder, frames_to_array
+
+
+class AsyncPort(serial.Serial):
+    """
+    Non blocking version of MyPort for asyncio, the event loop tells us when
+    bytes arrived (loop.add_reader on the port's file descriptor) instead of
+    waiting in readline, so one thread can serve several devices and other
+    I/O at the same time (works on linux/mac, not with Windows COM ports).
+    The frames are parsed like in MyPort.read_batch (or MyPort.read_frames
+    if binary is True), e.g:
+        async for frame in port.frames(): ...
+    """
+    def __init__(self, port, baudrate=9600, n_channels=8, binary=False):
+        serial.Serial.__init__(self,
+                               port=port,
+                               baudrate=baudrate,
+                               bytesize=serial.EIGHTBITS,
+                               parity=serial.PARITY_NONE,
+                               stopbits=serial.STOPBITS_ONE,
+                               timeout=0)
+        self.n_channels = n_channels
+        self.binary = binary
+        self.csv_stream = CsvStream()
+        self.frame_decoder = FrameDecoder()
+        # number of rejected lines/frames so far:
+        self.rejected = 0
+
+    def read_available(self):
+        """
+        Reads and parses everything in the input buffer without blocking,
+        returns a numpy array of shape (n_frames, n_channels)!
+        """
+        if self.binary:
+            frames = self.frame_decoder.feed(self.read(self.in_waiting))
+            frames, rejected = frames_to_array(frames, self.n_channels)
+        else:
+            self.csv_stream.fill(self.readinto, self.in_waiting)
+            frames, rejected = self.csv_stream.parse(self.n_channels)
+        self.rejected += rejected
+        return frames
+
+    async def wait_readable(self):
+        """Waits till bytes arrived without blocking the event loop"""
+        loop = asyncio.get_running_loop()
+        readable = loop.create_future()
+        fd = self.fileno()
+        loop.add_reader(fd, lambda: readable.done() or readable.set_result(None))
+        try:
+            await readable
+        finally:
+            # also if the waiting task got cancelled:
+            loop.remove_reader(fd)
+
+    async def frames_batch(self):
+        """
+        Asynchronous generator which yields all frames which arrived since
+        the last iteration as numpy array of shape (n_frames, n_channels)
+        """
+        while True:
+            frames = self.read_available()
+            if len(frames) > 0:
+                yield frames
+            else:
+                await self.wait_readable()
+
+    async def frames(self):
+        """Asynchronous generator which yields the frames one by one"""
+        async for frames in self.frames_batch():
+            for frame in frames:
+                yield frame
+
+
+def main():
+    """
+    This is an example of how to use this module, two simulated arduinos are
+    read in the same thread, after 2 seconds the reading tasks get cancelled!
+    """
+    from mylib.myio.mydevice import SimulatedArduino
+
+    async def count_frames(port, counts, name):
+        async for frame in port.frames():
+            counts[name] = counts.get(name, 0) + 1
+
+    async def run(ports):
+        counts = {}
+        tasks = [asyncio.create_task(count_frames(port, counts, f"port{i}"))
+                 for i, port in enumerate(ports)]
+        await asyncio.sleep(2)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        return counts
+
+    devices = [SimulatedArduino(rate=50), SimulatedArduino(rate=80, binary=True)]
+    for device in devices:
+        device.start()
+    ports = [AsyncPort(devices[0].port_name, 19200),
+             AsyncPort(devices[1].port_name, 19200, binary=True)]
+    print("frames received:", asyncio.run(run(ports)))
+    for port, device in zip(ports, devices):
+        port.close()
+        device.stop()
+
+
+if __name__ == '__main__':
+    main()
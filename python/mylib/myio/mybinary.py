@@ -0,0 +1,190 @@
+import os
+import struct
+import numpy as np
+
+from mylib.myio.mycsv import CsvStream
+
+# Binary recording format, all numbers are little endian:
+#     header (32 bytes): magic b"RSVB", version, flags (1 = with timestamps),
+#                        number of channels, numpy dtype string e.g. b"<u2",
+#                        sample rate in Hz as float64 (0.0 if unknown)
+#     frames: [time as float64 (if flags & 1)] value0, value1, ... value(n-1)
+# The file can be appended to at any time, a frame which was only partly
+# written (e.g. because of a crash) is ignored by the reader.
+MAGIC = b"RSVB"
+VERSION = 1
+HEADER = struct.Struct("<4sBBH4sd12x")
+WITH_TIMESTAMPS = 1
+
+
+def frame_dtype(n_channels, dtype, timestamps):
+    """Returns the numpy dtype of a single frame in the file"""
+    if timestamps:
+        return np.dtype([("time", "<f8"), ("values", dtype, (n_channels,))])
+    return np.dtype((dtype, (n_channels,)))
+
+
+def read_header(file):
+    data = file.read(HEADER.size)
+    if len(data) < HEADER.size:
+        raise ValueError("File is too short for a binary recording header!")
+    magic, version, flags, n_channels, dtype, rate = HEADER.unpack(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("File is not a binary recording (version " + str(VERSION) + ")!")
+    dtype = np.dtype(dtype.rstrip(b"\0").decode("ascii"))
+    return n_channels, dtype, rate, bool(flags & WITH_TIMESTAMPS)
+
+
+class BinaryWriter(object):
+    """
+    Writes frames of n_channels values (e.g. the arduino's 10bit analogRead
+    values as uint16) with optional host timestamps to a binary recording,
+    if the file already exists with the same layout new frames are appended!
+    """
+    def __init__(self, filename, n_channels, rate=0.0, timestamps=False, dtype=np.uint16):
+        self.n_channels = n_channels
+        self.dtype = np.dtype(dtype).newbyteorder("<")
+        self.timestamps = timestamps
+        self.frame_dtype = frame_dtype(n_channels, self.dtype, timestamps)
+
+        if os.path.exists(filename) and os.path.getsize(filename) > 0:
+            with open(filename, "rb") as file:
+                layout = read_header(file)
+            if layout[0] != n_channels or layout[1] != self.dtype or layout[3] != timestamps:
+                raise ValueError("Can't append to " + filename + " it has a different layout!")
+            self.file = open(filename, "r+b")
+            # cut off a partly written frame:
+            n_frames = (os.path.getsize(filename) - HEADER.size) // self.frame_dtype.itemsize
+            self.file.truncate(HEADER.size + n_frames * self.frame_dtype.itemsize)
+            self.file.seek(0, os.SEEK_END)
+        else:
+            self.file = open(filename, "wb")
+            flags = WITH_TIMESTAMPS if timestamps else 0
+            self.file.write(HEADER.pack(MAGIC, VERSION, flags, n_channels,
+                                        self.dtype.str.encode("ascii"), rate))
+
+    def write(self, frames, times=None):
+        """
+        Appends frames with shape (n_frames, >= n_channels), only the first
+        n_channels values are stored, if the file has timestamps the host
+        time of each frame must be given with times!
+        """
+        frames = np.atleast_2d(frames)[:, :self.n_channels]
+        if self.timestamps:
+            data = np.empty(len(frames), dtype=self.frame_dtype)
+            data["time"] = times
+            data["values"] = np.rint(frames) if frames.dtype.kind == "f" else frames
+        else:
+            data = np.rint(frames) if frames.dtype.kind == "f" else frames
+            data = np.ascontiguousarray(data, dtype=self.dtype)
+        self.file.write(data.tobytes())
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+class BinaryRecording(object):
+    """
+    Memory maps a binary recording, nothing is read until it is accessed,
+    so even recordings with hundreds of MB open instantly:
+    values - array of shape (n_frames, n_channels) (a view of the file)
+    times - array of the host timestamps or None
+    """
+    def __init__(self, filename):
+        with open(filename, "rb") as file:
+            self.n_channels, self.dtype, self.rate, has_timestamps = read_header(file)
+        dtype = frame_dtype(self.n_channels, self.dtype, has_timestamps)
+        n_frames = (os.path.getsize(filename) - HEADER.size) // dtype.itemsize
+        if n_frames == 0:
+            # numpy can't map an empty file region:
+            frames = np.zeros(0, dtype=dtype)
+        else:
+            frames = np.memmap(filename, dtype=dtype, mode="r",
+                               offset=HEADER.size, shape=(n_frames,))
+        if has_timestamps:
+            self.values = frames["values"]
+            self.times = frames["time"]
+        else:
+            self.values = frames
+            self.times = None
+
+    def __len__(self):
+        return len(self.values)
+
+    def channel(self, i):
+        """Returns the values of channel i as view without copying"""
+        return self.values[:, i]
+
+
+def read_binary_file(filename):
+    return BinaryRecording(filename)
+
+
+def csv_to_binary(csv_filename, binary_filename, n_channels=None, rate=0.0,
+                  dtype=np.uint16, block_size=1 << 22):
+    """
+    Converts a csv recording (e.g. written by MyPort.write_received_data_to_file)
+    block by block into a binary recording, so memory stays flat even for
+    huge files, if n_channels is None the number of values in the first
+    line is used! Lines with values which don't fit into an integer dtype
+    (e.g. negative values for uint16) are rejected instead of wrapped.
+    --------------------------------------------------------------------
+    Returns the number of converted frames and rejected lines!
+    """
+    stream = CsvStream(block_size)
+    writer = None
+    n_frames, n_rejected = 0, 0
+    limits = np.iinfo(dtype) if np.issubdtype(dtype, np.integer) else None
+    with open(csv_filename, "rb") as file:
+        while True:
+            n = stream.fill(file.readinto, block_size)
+            if not n and stream.used:
+                # the last line has no line break:
+                stream.feed(b"\n")
+            if n_channels is None:
+                end = stream.buffer.find(b"\n", 0, stream.used)
+                if end == -1:
+                    if n:
+                        continue  # the first line is longer than a block
+                    raise ValueError("Can't get the number of channels, " + csv_filename + " is empty!")
+                n_channels = stream.buffer[:end].count(b",") + 1
+            frames, rejected = stream.parse(n_channels)
+            if limits is not None:
+                # the values are rounded by BinaryWriter.write:
+                rounded = np.rint(frames)
+                in_range = ((rounded >= limits.min) & (rounded <= limits.max)).all(axis=1)
+                rejected += len(frames) - int(np.count_nonzero(in_range))
+                frames = frames[in_range]
+            if writer is None:
+                writer = BinaryWriter(binary_filename, n_channels, rate, dtype=dtype)
+            writer.write(frames)
+            n_frames += len(frames)
+            n_rejected += rejected
+            if not n:
+                break
+    writer.close()
+    return n_frames, n_rejected
+
+
+def main():
+    """
+    This is an example of how to use this module!
+    """
+    n_frames, rejected = csv_to_binary("myport_data.txt", "myport_data.bin")
+    print("converted frames:", n_frames, "rejected lines:", rejected)
+    recording = read_binary_file("myport_data.bin")
+    print("frames:", len(recording), "channels:", recording.n_channels)
+    print("channel 0:", recording.channel(0))
+
+    # new frames (e.g. from MyPort.read_batch) can simply be appended:
+    writer = BinaryWriter("myport_data.bin", recording.n_channels)
+    writer.write([[863, 840, 862, 884, 779, 583, 838, 925]])
+    writer.close()
+    print("frames after appending:", len(read_binary_file("myport_data.bin")))
+
+
+if __name__ == '__main__':
+    main()
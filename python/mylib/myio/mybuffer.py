@@ -0,0 +1,76 @@
+import numpy as np
+
+
+class ChannelBuffer(object):
+    """
+    Keeps the last capacity frames of n_channels sensor values in a
+    preallocated numpy ring buffer, so the memory stays the same no matter
+    how long we record! The values are stored as float32 by default, for
+    raw values of the arduino's analogRead (0 - 1023) dtype=np.uint16 halves
+    the memory (other values would be truncated or wrapped!).
+    Each frame is written twice (at i and i + capacity), that's why the last
+    n frames are always one contiguous block and can be returned as a
+    view without copying the data.
+    """
+    def __init__(self, n_channels, capacity, dtype=np.float32):
+        self.n_channels = n_channels
+        self.capacity = capacity
+        self.data = np.zeros((2 * capacity, n_channels), dtype=dtype)
+        # number of frames appended since the buffer was created:
+        self.total = 0
+
+    def __len__(self):
+        return min(self.total, self.capacity)
+
+    def append(self, frames):
+        """
+        Appends a single frame [value0, value1,...] or a batch of frames
+        with shape (n_frames, >= n_channels), only the first n_channels
+        values of a frame are stored!
+        """
+        frames = np.atleast_2d(frames)[:, :self.n_channels]
+        n = len(frames)
+        if n == 0:
+            return
+        # only the last capacity frames would survive anyways:
+        kept = frames[-self.capacity:]
+        indices = (self.total + n - len(kept) + np.arange(len(kept))) % self.capacity
+        self.data[indices] = kept
+        self.data[indices + self.capacity] = kept
+        self.total += n
+
+    def last(self, n=None):
+        """
+        Returns a view of the last n frames (all frames if n is None)
+        with shape (n, n_channels), the oldest frame comes first!
+        """
+        if n is None or n > len(self):
+            n = len(self)
+        end = self.total % self.capacity + self.capacity
+        return self.data[end - n:end]
+
+    def channel(self, i, n=None):
+        """Returns a view of the last n values of channel i"""
+        return self.last(n)[:, i]
+
+    def indices(self, n=None):
+        """Returns the sample numbers of the last n frames, e.g. for the x axis"""
+        if n is None or n > len(self):
+            n = len(self)
+        return np.arange(self.total - n, self.total)
+
+
+def main():
+    """
+    This is an example of how to use this module!
+    """
+    history = ChannelBuffer(3, 4)
+    history.append([1, 2, 3])
+    history.append([[4, 5, 6], [7, 8, 9], [10, 11, 12], [13, 14, 15]])
+    print("frames received:", history.total, "frames kept:", len(history))
+    print(history.last())
+    print("last 2 values of channel 0:", history.channel(0, 2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,153 @@
+from itertools import compress
+import numpy as np
+
+# all bytes which can be part of a line of csv numbers:
+VALID_BYTES = np.zeros(256, dtype=bool)
+VALID_BYTES[np.frombuffer(b"0123456789+-.eE, \r\n", dtype=np.uint8)] = True
+NEWLINE = ord("\n")
+COMMA = ord(",")
+
+
+def parse_line(line, n_channels, columns=None):
+    """
+    Slow path for a single line of a block, returns a list with the first
+    n_channels values (or the values of columns) or None if the line is garbage!
+    """
+    try:
+        values = [float(value) for value in line.split(b",")]
+    except ValueError:
+        return None
+    if len(values) < n_channels:
+        return None
+    if columns is not None:
+        return [values[i] for i in columns]
+    return values[:n_channels]
+
+
+def parse_csv_block(block, n_channels, columns=None):
+    """
+    Parses a block of complete csv lines e.g: b"863,840\\r\\n864,839\\r\\n" into
+    a numpy array of shape (n_lines, n_channels) in one vectorized step,
+    if a line has more than n_channels values only the first n_channels
+    values are kept (same as MyPort.read_csv does it)!
+    Lines with less than n_channels values or with values which cannot be
+    converted to float are rejected.
+    If columns (a list of indices < n_channels) is given only these values
+    are converted and the array has the shape (n_lines, len(columns)).
+    --------------------------------------------------------------------
+    Returns the array of accepted frames and a boolean array with one
+    entry per line which is True if the line was accepted!
+    """
+    block = bytes(block)
+    buf = np.frombuffer(block, dtype=np.uint8)
+    is_line_break = buf == NEWLINE
+    line_breaks = np.flatnonzero(is_line_break)
+    n_lines = len(line_breaks)
+    n_values = n_channels if columns is None else len(columns)
+    if n_lines == 0:
+        return np.empty((0, n_values)), np.zeros(0, dtype=bool)
+    # ignore an incomplete line at the end of the block:
+    end = line_breaks[-1] + 1
+    buf, is_line_break = buf[:end], is_line_break[:end]
+
+    # commas and line breaks, both end a value:
+    separators = np.flatnonzero((buf == COMMA) | is_line_break)
+    # a line has one separator more than commas:
+    commas = np.diff(np.searchsorted(separators, line_breaks), prepend=-1) - 1
+    # lines with bytes which can't be part of a number are garbage:
+    invalid_lines = np.searchsorted(line_breaks, np.flatnonzero(~VALID_BYTES[buf]))
+    valid = np.ones(n_lines, dtype=bool)
+    valid[invalid_lines] = False
+    valid &= commas + 1 >= n_channels
+
+    lines = block.split(b"\n")[:n_lines]
+    usecols = range(n_channels) if columns is None else columns
+    values = np.empty((n_lines, n_values))
+    # usually all lines have the same number of values, so this loops once:
+    for n_commas in np.unique(commas[valid]):
+        selected = valid & (commas == n_commas)
+        try:
+            values[selected] = np.loadtxt(compress(lines, selected), delimiter=",",
+                                          usecols=usecols, ndmin=2)
+        except ValueError:
+            # something like "1.2.3" or ",," slipped through, check line by line:
+            for i in np.flatnonzero(selected):
+                line_values = parse_line(lines[i], n_channels, columns)
+                if line_values is None:
+                    valid[i] = False
+                else:
+                    values[i] = line_values
+    return values[valid], valid
+
+
+class CsvStream(object):
+    """
+    Collects the raw bytes of a csv data stream in a reusable buffer and
+    parses all complete lines at once, an incomplete line at the end
+    is kept in the buffer until the rest of it arrives with the next read!
+    """
+    def __init__(self, size=4096):
+        self.buffer = bytearray(size)
+        self.used = 0
+        # the rejected lines of the last parse call:
+        self.rejected_lines = []
+        # the parsed block and the accepted lines of the last parse call:
+        self.block = b""
+        self.valid = np.zeros(0, dtype=bool)
+
+    def fill(self, readinto, size):
+        """
+        Calls readinto (e.g. serial.Serial.readinto) with a view of the next
+        size bytes of the buffer, the buffer grows if necessary!
+        """
+        if self.used + size > len(self.buffer):
+            self.buffer.extend(bytes(self.used + size - len(self.buffer)))
+        with memoryview(self.buffer) as view:
+            n = readinto(view[self.used:self.used + size])
+        self.used += n or 0
+        return n
+
+    def feed(self, data):
+        """Appends already received bytes to the buffer"""
+        def copy(view):
+            view[:] = data
+            return len(data)
+        return self.fill(copy, len(data))
+
+    def parse(self, n_channels):
+        """
+        Parses all complete lines in the buffer, see parse_csv_block!
+        --------------------------------------------------------------------
+        Returns a numpy array of shape (n_frames, n_channels) and the
+        number of rejected lines!
+        """
+        end = self.buffer.rfind(b"\n", 0, self.used) + 1
+        if end == 0:
+            self.block, self.valid, self.rejected_lines = b"", np.zeros(0, dtype=bool), []
+            return np.empty((0, n_channels)), 0
+        block = bytes(self.buffer[:end])
+        frames, valid = parse_csv_block(block, n_channels)
+        if len(frames) < len(valid):
+            lines = block.split(b"\n")
+            self.rejected_lines = [lines[i] for i in np.flatnonzero(~valid)]
+        else:
+            self.rejected_lines = []
+        self.block, self.valid = block, valid
+        # carry over the incomplete line to the next call:
+        rest = self.used - end
+        self.buffer[:rest] = self.buffer[end:self.used]
+        self.used = rest
+        return frames, len(valid) - len(frames)
+
+    def accepted_block(self):
+        """
+        Returns the accepted lines of the last parse call with all their
+        values (not only the first n_channels) as one block of bytes,
+        e.g. for a Recorder!
+        """
+        if self.valid.all():
+            block = self.block
+        else:
+            lines = self.block.split(b"\n")
+            block = b"".join([lines[i] + b"\n" for i in np.flatnonzero(self.valid)])
+        return block.replace(b"\r", b"")
@@ -0,0 +1,102 @@
+import os
+import time
+import random
+import select
+import math
+from threading import Thread
+
+from mylib.myio.myframe import encode_frame
+
+
+class SimulatedArduino(Thread):
+    """
+    Software stand-in for an arduino running readSensorValues.ino, to test
+    MyPort without hardware (only on linux/mac, a pseudo terminal is used).
+    Connect to it with MyPort(device.port_name) after device.start().
+    It sends rate frames per second with n_channels values, as csv lines or
+    binary frames (switched with the serial commands "b" and "a" like the
+    firmware), corrupt and drop are the probabilities that a byte of a
+    frame gets corrupted or that a whole frame is lost.
+    """
+    def __init__(self, n_channels=8, rate=50.0, binary=False, corrupt=0.0, drop=0.0, seed=None):
+        Thread.__init__(self, daemon=True)
+        self.n_channels = n_channels
+        self.rate = rate
+        self.binary = binary
+        self.corrupt = corrupt
+        self.drop = drop
+        self.random = random.Random(seed)
+        # tty only exists on linux/mac, the module can still be imported on windows:
+        import tty
+        self.master, self.slave = os.openpty()
+        tty.setraw(self.master)
+        tty.setraw(self.slave)
+        self.port_name = os.ttyname(self.slave)
+        self.counter = 0
+        self.frames_sent = 0
+        self.running = True
+
+    def values(self):
+        # slowly changing sensor values in the range of analogRead:
+        t = self.counter / self.rate
+        return [int(511 + 400 * math.sin(t + i) + self.random.randint(-5, 5))
+                for i in range(self.n_channels)]
+
+    def encode(self, values):
+        if self.binary:
+            return encode_frame(self.counter, values)
+        return (",".join(str(value) for value in values) + "\r\n").encode("ascii")
+
+    def read_commands(self):
+        while select.select([self.master], [], [], 0)[0]:
+            for command in os.read(self.master, 64):
+                if command == ord("b"):
+                    self.binary = True
+                elif command == ord("a"):
+                    self.binary = False
+
+    def run(self):
+        next_time = time.monotonic()
+        while self.running:
+            self.read_commands()
+            data = bytearray(self.encode(self.values()))
+            if self.random.random() < self.corrupt:
+                data[self.random.randrange(len(data))] ^= 0xFF
+            if self.random.random() >= self.drop:
+                os.write(self.master, data)
+                self.frames_sent += 1
+            self.counter += 1
+            next_time += 1 / self.rate
+            time.sleep(max(next_time - time.monotonic(), 0))
+
+    def stop(self):
+        self.running = False
+        self.join()
+        os.close(self.master)
+        os.close(self.slave)
+
+
+def main():
+    """
+    This is an example of how to use this module!
+    """
+    from mylib.myio.myport import MyPort
+
+    device = SimulatedArduino(rate=100, corrupt=0.05, drop=0.05, seed=1)
+    device.start()
+    port = MyPort(device.port_name, baudrate=19200)
+    time.sleep(0.5)
+    frames, rejected = port.read_batch(8)
+    print("csv:", len(frames), "frames,", rejected, "rejected lines")
+
+    port.set_binary_mode(True)
+    time.sleep(0.5)
+    frames, rejected = port.read_frames(8)
+    print("binary:", len(frames), "frames,", rejected, "rejected frames")
+    print(port.frame_decoder.stats())
+    port.close()
+    device.stop()
+
+
+if __name__ == '__main__':
+    main()
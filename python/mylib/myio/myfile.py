@@ -1,3 +1,7 @@
+import numpy as np
+
+from mylib.myio.mycsv import parse_csv_block
+
 
 def read_data_from_file(filename, **kwargs):
     data_lists = []
@@ -20,12 +24,84 @@ def read_data_from_file(filename, **kwargs):
     return data_lists
 
 
+def iter_data_from_file(filename, columns=None, start=0, stop=None, errors="skip",
+                        bad_lines=None, block_size=1 << 22):
+    """
+    Reads the csv file block by block (block_size bytes at a time) and yields
+    a numpy array of shape (n_rows, len(columns)) for each block, so only one
+    block is in memory at a time instead of the whole file!
+    columns: indices of the csv values we want e.g. [0, 3], only these are
+             converted to float, None means all values of the first line
+    start, stop: only rows start <= row < stop are returned, where row is
+                 the line number in the file starting at 0
+    errors: "skip" to skip lines which can't be parsed, "raise" to raise a
+            ValueError instead, empty lines are always skipped
+    bad_lines: if a list is given the line numbers of skipped lines are
+               appended to it
+    """
+    n_channels = None
+    line_number = 0  # line number of the first line in the block
+    rest = b""
+    with open(filename, "rb") as file:
+        while stop is None or line_number < stop:
+            data = file.read(block_size)
+            block = rest + data
+            if not data:
+                if not block:
+                    break
+                block += b"\n"  # the last line has no line break
+            end = block.rfind(b"\n") + 1
+            block, rest = block[:end], block[end:]
+            n_lines = block.count(b"\n")
+            if line_number + n_lines <= start:
+                line_number += n_lines
+                continue
+            if n_channels is None:
+                if columns is None:
+                    columns = list(range(block[:block.find(b"\n")].count(b",") + 1))
+                n_channels = max(columns) + 1
+
+            frames, valid = parse_csv_block(block, n_channels, columns)
+            numbers = line_number + np.arange(n_lines)
+            in_range = numbers >= start
+            if stop is not None:
+                in_range &= numbers < stop
+            if not valid[in_range].all():
+                lines = block.split(b"\n")
+                for i in np.flatnonzero(in_range & ~valid):
+                    # empty lines are no errors:
+                    if len(lines[i].strip()) == 0:
+                        continue
+                    if errors == "raise":
+                        raise ValueError(f"Can't parse line {numbers[i]} of {filename}: {lines[i]}")
+                    if bad_lines is not None:
+                        bad_lines.append(int(numbers[i]))
+            line_number += n_lines
+            yield frames[in_range[valid]]
+
+
+def load_data_from_file(filename, columns=None, **kwargs):
+    """
+    Same as iter_data_from_file, but returns all rows in one numpy array of
+    shape (n_rows, len(columns)), use array[:, i] to get the i-th column!
+    """
+    chunks = list(iter_data_from_file(filename, columns, **kwargs))
+    if not chunks:
+        return np.empty((0, len(columns) if columns else 0))
+    return np.concatenate(chunks)
+
+
 def main():
     """
     This is an example of how to use this module!
     """
     data = read_data_from_file("myport_data.txt", size=8)
     print(data)
+    # the same with numpy arrays, but only the columns 0 and 2 from row 1 on:
+    bad_lines = []
+    data = load_data_from_file("myport_data.txt", columns=[0, 2], start=1, bad_lines=bad_lines)
+    print(data)
+    print("lines which couldn't be parsed:", bad_lines)
 
 
 if __name__ == '__main__':
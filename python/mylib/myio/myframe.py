@@ -0,0 +1,147 @@
+import struct
+import numpy as np
+
+# Binary frame as sent by readSensorValues.ino in binary mode (little endian):
+#     sync word 0xA5 0x5A | counter uint16 | n uint8 | n samples uint16 | crc8
+# The crc8 (polynomial 0x07, initial value 0) covers counter, n and samples.
+SYNC = b"\xa5\x5a"
+HEADER = struct.Struct("<HB")
+HEADER_SIZE = len(SYNC) + HEADER.size
+MAX_SAMPLES = 64
+
+
+def make_crc8_table(polynomial=0x07):
+    table = []
+    for byte in range(256):
+        crc = byte
+        for _ in range(8):
+            crc = ((crc << 1) ^ polynomial) if crc & 0x80 else (crc << 1)
+        table.append(crc & 0xFF)
+    return table
+
+
+CRC8_TABLE = make_crc8_table()
+
+
+def crc8(data):
+    crc = 0
+    for byte in data:
+        crc = CRC8_TABLE[crc ^ byte]
+    return crc
+
+
+def encode_frame(counter, samples):
+    """Returns the bytes of a frame, like the arduino sends it"""
+    body = HEADER.pack(counter & 0xFFFF, len(samples))
+    body += struct.pack(f"<{len(samples)}H", *samples)
+    return SYNC + body + bytes([crc8(body)])
+
+
+class FrameDecoder(object):
+    """
+    Decodes binary frames from a byte stream, bytes can be fed in pieces of
+    any size. If a frame is corrupted (wrong crc) we search for the next
+    sync word and count it in crc_errors, gaps in the frame counter which
+    aren't explained by crc errors are counted as dropped frames!
+    """
+    def __init__(self):
+        self.buffer = bytearray()
+        self.last_counter = None
+        self.frames = 0
+        self.crc_errors = 0
+        self.skipped_bytes = 0
+        self.dropped = 0
+        # crc errors since the last good frame, they are part of the counter gap:
+        self.gap_crc_errors = 0
+
+    def reset(self):
+        self.buffer.clear()
+        self.last_counter = None
+        self.gap_crc_errors = 0
+
+    def feed(self, data):
+        """
+        Appends data to the not yet decoded bytes and decodes all complete frames,
+        returns a list with a tuple of samples for each frame!
+        """
+        self.buffer += data
+        buf = self.buffer
+        frames = []
+        pos = 0
+        while True:
+            start = buf.find(SYNC, pos)
+            if start < 0:
+                # the last byte could be the first half of a sync word:
+                keep = len(buf) - 1 if buf.endswith(SYNC[:1]) else len(buf)
+                self.skipped_bytes += max(keep - pos, 0)
+                pos = max(keep, pos)
+                break
+            self.skipped_bytes += start - pos
+            if start + HEADER_SIZE > len(buf):
+                pos = start
+                break
+            counter, n = HEADER.unpack_from(buf, start + len(SYNC))
+            if n == 0 or n > MAX_SAMPLES:
+                # not a real sync word, just samples which look like one:
+                pos = start + 1
+                continue
+            end = start + HEADER_SIZE + 2 * n + 1
+            if end > len(buf):
+                pos = start
+                break
+            if crc8(buf[start + len(SYNC):end - 1]) != buf[end - 1]:
+                self.crc_errors += 1
+                self.gap_crc_errors += 1
+                pos = start + 1
+                continue
+            frames.append(struct.unpack_from(f"<{n}H", buf, start + HEADER_SIZE))
+            if self.last_counter is not None:
+                gap = (counter - self.last_counter - 1) & 0xFFFF
+                self.dropped += max(gap - self.gap_crc_errors, 0)
+            self.gap_crc_errors = 0
+            self.last_counter = counter
+            self.frames += 1
+            pos = end
+        del buf[:pos]
+        return frames
+
+    def stats(self):
+        return {"frames": self.frames,
+                "crc_errors": self.crc_errors,
+                "skipped_bytes": self.skipped_bytes,
+                "dropped": self.dropped}
+
+
+def frames_to_array(frames, n_channels):
+    """
+    Converts the frames of FrameDecoder.feed into a numpy array of shape
+    (n_frames, n_channels), frames with less samples are rejected!
+    --------------------------------------------------------------------
+    Returns the array and the number of rejected frames!
+    """
+    accepted = [frame[:n_channels] for frame in frames if len(frame) >= n_channels]
+    if not accepted:
+        return np.empty((0, n_channels)), len(frames)
+    return np.array(accepted, dtype=np.float64), len(frames) - len(accepted)
+
+
+def main():
+    """
+    This is an example of how to use this module!
+    """
+    stream = b"".join(encode_frame(i, [863, 840, 862, 884, 779, 583, 838, 925 + i])
+                      for i in range(5) if i != 2)
+    # corrupt a byte of the second frame:
+    corrupted = bytearray(stream)
+    corrupted[30] ^= 0xFF
+    decoder = FrameDecoder()
+    # feed the stream in small pieces like they arrive over the serial port:
+    frames = []
+    for i in range(0, len(corrupted), 7):
+        frames.extend(decoder.feed(corrupted[i:i + 7]))
+    print(frames_to_array(frames, 8))
+    print(decoder.stats())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,153 @@
+import time
+import numpy as np
+
+# upper edges of the read latency histogram in seconds (the last bin is open):
+LATENCY_EDGES = np.array([0.0001, 0.0002, 0.0005, 0.001, 0.002, 0.005,
+                          0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1.0])
+# causes of garbage lines:
+SHORT = "short"
+NON_FLOAT = "non_float"
+DECODE = "decode"
+CRC = "crc"
+EMPTY = "empty"
+
+
+def garbage_cause(line, n_channels):
+    """Returns why the (bytes) line was rejected, one of EMPTY, SHORT, NON_FLOAT and DECODE"""
+    try:
+        line = line.decode("ascii").strip()
+    except UnicodeDecodeError:
+        return DECODE
+    if not line:
+        return EMPTY
+    str_values = line.split(",")
+    if len(str_values) < n_channels:
+        return SHORT
+    return NON_FLOAT
+
+
+class PortMetrics(object):
+    """
+    Health numbers of a serial port which are cheap to collect at frame rate:
+    frames and bytes (per second), garbage lines by cause, a histogram of the
+    time spent waiting in readline/read and the depth of the serial input
+    buffer. The numbers are collected silently, if log is given (e.g. print
+    or logging.info) a summary is passed to it at most every log_interval
+    seconds instead of printing every garbage line!
+    """
+    def __init__(self, log=None, log_interval=5.0, rate_window=1.0):
+        self.log = log
+        self.log_interval = log_interval
+        self.rate_window = rate_window
+        self.frames = 0
+        self.bytes = 0
+        self.garbage = {SHORT: 0, NON_FLOAT: 0, DECODE: 0, CRC: 0, EMPTY: 0}
+        self.last_garbage = None
+        self.latency_histogram = np.zeros(len(LATENCY_EDGES) + 1, dtype=np.int64)
+        self.in_waiting = 0
+        self.in_waiting_max = 0
+        now = time.monotonic()
+        self.last_log_time = now
+        self.rate_time = now
+        self.rate_frames = 0
+        self.rate_bytes = 0
+        self.frames_per_second = 0.0
+        self.bytes_per_second = 0.0
+
+    def add_frames(self, n_frames, n_bytes):
+        self.frames += n_frames
+        self.bytes += n_bytes
+
+    def add_garbage(self, cause, line=None, n=1):
+        self.garbage[cause] += n
+        if line is not None:
+            self.last_garbage = line
+
+    def add_latency(self, seconds):
+        self.latency_histogram[np.searchsorted(LATENCY_EDGES, seconds)] += 1
+
+    def set_in_waiting(self, n_bytes):
+        """The number of bytes which were waiting in the input buffer before a read"""
+        self.in_waiting = n_bytes
+        if n_bytes > self.in_waiting_max:
+            self.in_waiting_max = n_bytes
+
+    def update_rates(self, now):
+        elapsed = now - self.rate_time
+        if elapsed >= self.rate_window:
+            self.frames_per_second = (self.frames - self.rate_frames) / elapsed
+            self.bytes_per_second = (self.bytes - self.rate_bytes) / elapsed
+            self.rate_time = now
+            self.rate_frames = self.frames
+            self.rate_bytes = self.bytes
+
+    def latency_percentile(self, q):
+        """
+        Returns the upper edge of the histogram bin which contains the q-th
+        percentile of the read latencies (inf for the open last bin)!
+        """
+        counts = np.cumsum(self.latency_histogram)
+        if counts[-1] == 0:
+            return 0.0
+        i = int(np.searchsorted(counts, q / 100 * counts[-1]))
+        return float(LATENCY_EDGES[i]) if i < len(LATENCY_EDGES) else float("inf")
+
+    def snapshot(self):
+        """
+        Returns a dict with the current numbers, the rates are measured over
+        at least rate_window seconds so this can be called as often as wanted!
+        """
+        self.update_rates(time.monotonic())
+        return {"frames": self.frames,
+                "bytes": self.bytes,
+                "frames_per_second": self.frames_per_second,
+                "bytes_per_second": self.bytes_per_second,
+                "garbage": dict(self.garbage),
+                "last_garbage": self.last_garbage,
+                "latency_edges": LATENCY_EDGES.tolist(),
+                "latency_histogram": self.latency_histogram.tolist(),
+                "latency_p50": self.latency_percentile(50),
+                "latency_p99": self.latency_percentile(99),
+                "in_waiting": self.in_waiting,
+                "in_waiting_max": self.in_waiting_max}
+
+    def summary(self):
+        s = self.snapshot()
+        garbage = ", ".join(f"{cause}: {n}" for cause, n in s["garbage"].items() if n)
+        return (f"{s['frames_per_second']:.1f} frames/s, {s['bytes_per_second']:.0f} bytes/s, "
+                f"garbage: {garbage or 0}, read latency p50/p99: "
+                f"{s['latency_p50'] * 1000:g}/{s['latency_p99'] * 1000:g} ms, "
+                f"in_waiting: {s['in_waiting']} (max {s['in_waiting_max']}) bytes")
+
+    def maybe_log(self):
+        """Passes the summary to log if log_interval seconds have passed, cheap otherwise"""
+        if self.log is None:
+            return
+        now = time.monotonic()
+        if now - self.last_log_time >= self.log_interval:
+            self.last_log_time = now
+            self.log(self.summary())
+
+
+def main():
+    """
+    This is an example of how to use this module with a simulated arduino!
+    """
+    from mylib.myio.myport import MyPort
+    from mylib.myio.mydevice import SimulatedArduino
+
+    device = SimulatedArduino(rate=200, corrupt=0.05, seed=1)
+    device.start()
+    port = MyPort(device.port_name, baudrate=115200)
+    port.metrics.log = print
+    port.metrics.log_interval = 1.0
+    end = time.monotonic() + 3
+    while time.monotonic() < end:
+        port.read_batch(8)
+    print(port.metrics.snapshot())
+    port.close()
+    device.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,264 @@
+import time
+from threading import Thread, Lock
+
+import numpy as np
+
+
+class PortReader(Thread):
+    """
+    Reads batches of frames from one MyPort in its own thread and stamps each
+    frame with the host's monotonic time, the frames of a batch are spread
+    back in time by the measured frame period since they arrived one after
+    another while we were waiting.
+    Instead of a MyPort port can be a function returning a numpy array of
+    frames (or a tuple (frames, rejected) like read_batch). If capacity is
+    given at most capacity frames are kept, older ones are dropped and
+    counted in self.dropped.
+    If reading fails (e.g. the board was unplugged) the thread ends and the
+    error is raised by take!
+    """
+    # seconds to wait after a read which returned nothing, so a port without
+    # timeout or a function which returns at once doesn't spin:
+    idle_time = 0.005
+
+    def __init__(self, port, n_channels, capacity=None):
+        Thread.__init__(self, daemon=True)
+        self.port = port
+        self.n_channels = n_channels
+        self.capacity = capacity
+        self.lock = Lock()
+        # the batches (times, frames) since the last take, oldest first, they
+        # are only concatenated when they are taken:
+        self.batches = []
+        self.n_pending = 0
+        self.period = 0.0  # estimated time between two frames
+        self.last_time = None
+        self.total = 0
+        self.dropped = 0
+        # the exception which ended the reading:
+        self.error = None
+        self.running = True
+
+    def read(self):
+        if callable(self.port):
+            result = self.port()
+        elif self.port.binary:
+            result = self.port.read_frames(self.n_channels)
+        else:
+            result = self.port.read_batch(self.n_channels)
+        return result[0] if isinstance(result, tuple) else result
+
+    def run(self):
+        try:
+            self.record()
+        except Exception as error:
+            self.error = error
+            self.running = False
+
+    def record(self):
+        while self.running:
+            frames = self.read()
+            now = time.monotonic()
+            n = len(frames)
+            if n == 0:
+                time.sleep(self.idle_time)
+                continue
+            if self.last_time is not None:
+                # smooth the estimate, batches can be late:
+                self.period += 0.1 * ((now - self.last_time) / n - self.period)
+            self.last_time = now
+            times = now - self.period * np.arange(n - 1, -1, -1)
+            with self.lock:
+                self.batches.append((times, frames[:, :self.n_channels]))
+                self.n_pending += n
+                self.total += n
+                if self.capacity is not None:
+                    # whole batches which are too old, the rest is cut in pending:
+                    while self.n_pending - len(self.batches[0][0]) >= self.capacity:
+                        self.n_pending -= len(self.batches[0][0])
+                        self.dropped += len(self.batches.pop(0)[0])
+
+    def pending(self):
+        """
+        Returns the host times of shape (n,) and the frames of shape
+        (n, n_channels) which arrived since the last take, the lock must be
+        held! Raises the error if reading failed.
+        """
+        if self.error is not None:
+            raise self.error
+        if not self.batches:
+            return np.empty(0), np.empty((0, self.n_channels))
+        if len(self.batches) > 1:
+            self.batches = [(np.concatenate([times for times, _ in self.batches]),
+                             np.concatenate([frames for _, frames in self.batches]))]
+        times, frames = self.batches[0]
+        if self.capacity is not None and len(times) > self.capacity:
+            self.dropped += len(times) - self.capacity
+            times, frames = times[-self.capacity:], frames[-self.capacity:]
+            self.batches = [(times, frames)]
+            self.n_pending = len(times)
+        return times, frames
+
+    def discard(self, n):
+        """Removes the first n pending frames, the lock must be held"""
+        times, frames = self.pending()
+        self.batches = [(times[n:], frames[n:])] if n < len(times) else []
+        self.n_pending = len(times) - min(n, len(times))
+
+    def take(self):
+        """
+        Removes all frames which arrived so far, returns their host times
+        of shape (n,) and the frames of shape (n, n_channels)!
+        Raises the error if reading failed.
+        """
+        with self.lock:
+            times, frames = self.pending()
+            self.batches = []
+            self.n_pending = 0
+        return times, frames
+
+    def stop(self):
+        self.running = False
+        self.join()
+
+
+class MultiPort(object):
+    """
+    Reads several MyPorts (e.g. one for each mux board) at the same time and
+    merges their frames into one stream of wide frames: for each frame of
+    the reference port the nearest frame (in host time) of every other
+    port is taken if it's not further away than tolerance seconds, if a
+    port has no matching frame the reference frame is dropped.
+    A port which stops sending doesn't block the others for longer than
+    max_wait seconds.
+    """
+    def __init__(self, ports, n_channels, tolerance=0.05, reference=0, max_wait=1.0):
+        if isinstance(n_channels, int):
+            n_channels = [n_channels] * len(ports)
+        self.readers = [PortReader(port, n) for port, n in zip(ports, n_channels)]
+        self.tolerance = tolerance
+        self.reference = reference
+        self.max_wait = max_wait
+        self.merged = 0
+        self.unmatched = 0
+        self.skews = np.zeros(len(ports))
+        self.last_stats_time = time.monotonic()
+        self.last_totals = [0] * len(ports)
+
+    def start(self):
+        for reader in self.readers:
+            reader.start()
+
+    def stop(self):
+        for reader in self.readers:
+            reader.stop()
+
+    def read_merged(self):
+        """
+        Merges all frames which can be decided by now (every other port has
+        frames later than tolerance after them or max_wait has passed).
+        --------------------------------------------------------------------
+        Returns the host times of shape (n,) and the wide frames of shape
+        (n, sum of n_channels), the columns are ordered port by port!
+        Raises the error of a port which can't be read anymore.
+        """
+        snapshot = []
+        for reader in self.readers:
+            with reader.lock:
+                snapshot.append(reader.pending())
+        ref_times, ref_frames = snapshot[self.reference]
+        # frames which can't get a better partner anymore, a slow port only
+        # holds them back for max_wait seconds:
+        latest = [times[-1] if len(times) else -np.inf
+                  for i, (times, _) in enumerate(snapshot) if i != self.reference]
+        decided_until = max(min(latest, default=np.inf) - self.tolerance,
+                            time.monotonic() - self.max_wait)
+        n = int(np.searchsorted(ref_times, decided_until, side="right"))
+        times = ref_times[:n]
+
+        matched = np.ones(n, dtype=bool)
+        columns = []
+        for i, (port_times, port_frames) in enumerate(snapshot):
+            if i == self.reference:
+                columns.append(ref_frames[:n])
+                continue
+            if len(port_times) == 0:
+                matched[:] = False
+                columns.append(np.zeros((n, port_frames.shape[1])))
+                continue
+            # index of the nearest frame of this port:
+            right = np.clip(np.searchsorted(port_times, times), 1, len(port_times) - 1)
+            left = right - 1
+            nearest = np.where(np.abs(port_times[left] - times) <= np.abs(port_times[right] - times),
+                               left, right) if len(port_times) > 1 else np.zeros(n, dtype=int)
+            skew = port_times[nearest] - times
+            matched &= np.abs(skew) <= self.tolerance
+            if np.any(matched):
+                self.skews[i] = skew[matched].mean()
+            columns.append(port_frames[nearest])
+
+        wide = np.concatenate(columns, axis=1)[matched]
+        self.merged += int(np.count_nonzero(matched))
+        self.unmatched += int(n - np.count_nonzero(matched))
+        # the reference frames still to come are later than decided_until:
+        self.discard(times[-1] if n else decided_until, n)
+        return times[matched], wide
+
+    def discard(self, last_time, n):
+        """
+        Removes the n merged reference frames and the frames of the other
+        ports which are too old to be matched with a reference frame after
+        last_time, even if the reference port sends nothing!
+        """
+        for i, reader in enumerate(self.readers):
+            with reader.lock:
+                if i == self.reference:
+                    reader.discard(n)
+                else:
+                    times, _ = reader.pending()
+                    reader.discard(int(np.searchsorted(times, last_time - self.tolerance)))
+
+    def stats(self):
+        """
+        Returns a dict with the frames/s of each port since the last call,
+        the mean time offset (skew) of each port to the reference port and
+        the number of merged and dropped (unmatched) reference frames!
+        """
+        now = time.monotonic()
+        elapsed = max(now - self.last_stats_time, 1e-9)
+        totals = [reader.total for reader in self.readers]
+        rates = [(total - last) / elapsed for total, last in zip(totals, self.last_totals)]
+        self.last_stats_time = now
+        self.last_totals = totals
+        return {"rates": rates,
+                "skews": self.skews.tolist(),
+                "merged": self.merged,
+                "unmatched": self.unmatched}
+
+
+def main():
+    """
+    This is an example of how to use this module with simulated arduinos!
+    """
+    from mylib.myio.myport import MyPort
+    from mylib.myio.mydevice import SimulatedArduino
+
+    devices = [SimulatedArduino(rate=50), SimulatedArduino(rate=50), SimulatedArduino(rate=80)]
+    for device in devices:
+        device.start()
+    ports = [MyPort(device.port_name, baudrate=19200) for device in devices]
+    multiport = MultiPort(ports, 8, tolerance=0.02)
+    multiport.start()
+    for _ in range(5):
+        time.sleep(0.5)
+        times, frames = multiport.read_merged()
+        print(frames.shape, "merged frames")
+    print(multiport.stats())
+    multiport.stop()
+    for port, device in zip(ports, devices):
+        port.close()
+        device.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,5 +1,11 @@
+import time
 import serial
 
+from mylib.myio.mycsv import CsvStream
+from mylib.myio.mymetrics import PortMetrics, garbage_cause, SHORT, NON_FLOAT, DECODE, CRC
+from mylib.myio.myrecorder import Recorder
+from mylib.myio.myframe import FrameDecoder, frames_to_array
+
 class MyPort(serial.Serial):
 
     def __init__(self, port, baudrate=9600, timeout=1):
@@ -11,6 +17,15 @@ class MyPort(serial.Serial):
                                stopbits=serial.STOPBITS_ONE,
                                timeout=timeout)
         self.data_lines = []
+        # if recording, received lines go to the recorder instead of data_lines:
+        self.recorder = None
+        # bytes of incomplete lines are kept here between read_batch calls:
+        self.csv_stream = CsvStream()
+        # if the arduino sends binary frames (see set_binary_mode):
+        self.binary = False
+        self.frame_decoder = FrameDecoder()
+        # health numbers instead of printing every garbage line:
+        self.metrics = PortMetrics()
 
     def read_csv(self, list_of_lists):
         """
@@ -18,32 +33,17 @@ class MyPort(serial.Serial):
         list inside determines how much sensor values are acually read!
         If the arduino sends us always 8 csv sensor values we can save the
         first 3 sensor values in the list_of_lists, the full information is
-        always saved in self.data_lines!
+        always saved in self.data_lines (or written to file if recording)!
         --------------------------------------------------------------------
-        Returns True if reading attempt was successful, prints error message
-        and False if something went wrong!
+        Returns True if reading attempt was successful and False if something
+        went wrong (counted in self.metrics)!
         """
-        try:
-            bytes = self.readline()
-            line = bytes.decode("ascii")[:-2]
-            str_values = line.split(",")
-        except Exception as e:
-            print(e, "\nbytes:", bytes)
-            return False
-        # exit earlier if a reading (or writing problem on arduino) occurred
-        if len(str_values) < len(list_of_lists):
-            print("Garbage Value: " + line + " less data received than expected!")
-            return False
-        try:
-            for value in str_values:
-                float(value)
-        except ValueError:
-            print("Garbage Value: " + line + " received, which cannot be converted to float!")
+        str_values = self.read_values(len(list_of_lists))
+        if str_values is None:
             return False
         # append the valid data
         for i, a_list in enumerate(list_of_lists):
             a_list.append(float(str_values[i]))
-        self.data_lines.append(line + "\n")
         return True
 
     def read_csv_for_bar(self, a_list, number_of_bars):
@@ -52,34 +52,184 @@ class MyPort(serial.Serial):
         the serial port where number_of_bars specifies how moch values
         will be written in a_list e.g: number_of_bars = 3 then a_list will
         look like [bar0, bar1, bar2] even if we receive 8 csv values,
-        in self.data_lines the full information will be stored,
+        in self.data_lines the full information will be stored (or written
+        to file if recording),
         in the mygraph module a format like: [bar0, bar1, bar2,...] will be expected
         in real_time_data_bar_chart's update_func!
         """
-        try:
-            bytes = self.readline()
-            line = bytes.decode("ascii")[:-2]
-            str_values = line.split(",")
-        except Exception as e:
-            print(e, "\nbytes:", bytes)
-            return False
-        # exit earlier if a reading (or writing problem on arduino) occurred
         number_of_bars = len(a_list)
-        if len(str_values) < number_of_bars:
-            print("Garbage Value: " + line + " less data received than expected!")
-            return False
-        try:
-            for value in str_values:
-                float(value)
-        except ValueError:
-            print("Garbage Value: " + line + " received, which cannot be converted to float!")
+        str_values = self.read_values(number_of_bars)
+        if str_values is None:
             return False
         # append the valid data
         for i in range(number_of_bars):
             a_list[i] = float(str_values[i])
-        self.data_lines.append(line + "\n")
         return True
 
+    def read_values(self, n_values):
+        """
+        Reads a line and checks that it has at least n_values csv values which
+        can be converted to float, the line is saved (see save_line) if so,
+        otherwise it is counted as garbage in self.metrics!
+        --------------------------------------------------------------------
+        Returns the csv values of the line as strings or None for garbage
+        (or if nothing arrived within timeout)!
+        """
+        self.metrics.set_in_waiting(self.in_waiting)
+        start = time.perf_counter()
+        bytes = self.readline()
+        self.metrics.add_latency(time.perf_counter() - start)
+        self.metrics.add_frames(0, len(bytes))
+        if not bytes:
+            # readline timed out, nothing arrived (that's no garbage):
+            self.metrics.maybe_log()
+            return None
+        try:
+            line = bytes.decode("ascii")[:-2]
+        except UnicodeDecodeError:
+            self.metrics.add_garbage(DECODE, bytes)
+            self.metrics.maybe_log()
+            return None
+        str_values = line.split(",")
+        # a reading (or writing problem on arduino) occurred:
+        if len(str_values) < n_values:
+            self.metrics.add_garbage(SHORT, line)
+            self.metrics.maybe_log()
+            return None
+        try:
+            for value in str_values:
+                float(value)
+        except ValueError:
+            self.metrics.add_garbage(NON_FLOAT, line)
+            self.metrics.maybe_log()
+            return None
+        self.metrics.add_frames(1, 0)
+        self.metrics.maybe_log()
+        self.save_line(line)
+        return str_values
+
+    def read_batch(self, n_channels):
+        """
+        Reads everything which is waiting in the input buffer with a single
+        read and parses all complete lines at once, an incomplete line at the
+        end is carried over to the next call instead of being thrown away.
+        If nothing is waiting we wait for at most timeout seconds.
+        Only the first n_channels csv values of each line are kept, lines
+        with less values or values which cannot be converted to float are
+        rejected, the received lines are not saved in self.data_lines but
+        the accepted lines (with all their values) are written to file if
+        recording!
+        --------------------------------------------------------------------
+        Returns a numpy array of shape (n_frames, n_channels) and the number
+        of rejected lines!
+        """
+        waiting = self.in_waiting
+        self.metrics.set_in_waiting(waiting)
+        start = time.perf_counter()
+        n_bytes = 0
+        if waiting == 0:
+            # wait for at most timeout seconds till something arrives:
+            n_bytes = self.csv_stream.fill(self.readinto, 1) or 0
+            waiting = self.in_waiting
+        n_bytes += self.csv_stream.fill(self.readinto, waiting) or 0
+        self.metrics.add_latency(time.perf_counter() - start)
+        frames, rejected = self.csv_stream.parse(n_channels)
+        self.metrics.add_frames(len(frames), n_bytes)
+        for line in self.csv_stream.rejected_lines:
+            self.metrics.add_garbage(garbage_cause(line, n_channels), line)
+        self.metrics.maybe_log()
+        if self.recorder:
+            self.recorder.write_block(self.csv_stream.accepted_block())
+        return frames, rejected
+
+    def set_binary_mode(self, binary):
+        """
+        Tells the arduino to send binary frames (sync word, frame counter,
+        uint16 samples and crc8) instead of csv lines or the other way round,
+        binary frames need about a third of the bytes, read them with read_frames!
+        """
+        self.write(b"b" if binary else b"a")
+        self.binary = binary
+        self.frame_decoder.reset()
+        self.csv_stream = CsvStream()
+
+    def read_frames(self, n_channels):
+        """
+        The same as read_batch but for binary frames, corrupted frames are
+        skipped and the decoder searches for the next sync word, frames lost
+        in between are counted in self.frame_decoder.dropped!
+        --------------------------------------------------------------------
+        Returns a numpy array of shape (n_frames, n_channels) and the number
+        of rejected frames (crc errors and frames with too few samples)!
+        """
+        crc_errors = self.frame_decoder.crc_errors
+        waiting = self.in_waiting
+        self.metrics.set_in_waiting(waiting)
+        start = time.perf_counter()
+        if waiting == 0:
+            # wait for at most timeout seconds till something arrives:
+            data = self.read(1)
+            data += self.read(self.in_waiting)
+        else:
+            data = self.read(waiting)
+        self.metrics.add_latency(time.perf_counter() - start)
+        decoded = self.frame_decoder.feed(data)
+        frames, rejected = frames_to_array(decoded, n_channels)
+        crc_errors = self.frame_decoder.crc_errors - crc_errors
+        self.metrics.add_frames(len(frames), len(data))
+        if rejected:
+            self.metrics.add_garbage(SHORT, n=rejected)
+        if crc_errors:
+            self.metrics.add_garbage(CRC, n=crc_errors)
+        self.metrics.maybe_log()
+        if self.recorder:
+            # all samples of the accepted frames, not only the first n_channels:
+            self.recorder.write([frame for frame in decoded if len(frame) >= n_channels])
+        return frames, rejected + crc_errors
+
+    def read_into(self, history):
+        """
+        Reads a batch of frames (see read_batch and read_frames) and appends them to history,
+        a ChannelBuffer from the mybuffer module which keeps a bounded amount
+        of frames, this method can be used as update_func in the mygraph
+        module's plot_real_time_data!
+        --------------------------------------------------------------------
+        Returns the number of frames appended to history!
+        """
+        if self.binary:
+            frames, rejected = self.read_frames(history.n_channels)
+        else:
+            frames, rejected = self.read_batch(history.n_channels)
+        history.append(frames)
+        return len(frames)
+
+    def save_line(self, line):
+        if self.recorder:
+            self.recorder.write_line(line)
+        else:
+            self.data_lines.append(line + "\n")
+
+    def start_recording(self, filename, **kwargs):
+        """
+        From now on all received data is written to the file with the given
+        filename while it arrives instead of collecting it in self.data_lines,
+        the kwargs are passed to the Recorder (flush/fsync policy, rotation...)
+        """
+        self.stop_recording()
+        self.recorder = Recorder(filename, **kwargs)
+        self.recorder.start()
+
+    def stop_recording(self):
+        """
+        Writes the pending data and closes the file, returns the recorder's
+        stats (raises the recorder's error if writing failed)!
+        """
+        if not self.recorder:
+            return None
+        recorder, self.recorder = self.recorder, None
+        recorder.stop()
+        return recorder.stats()
+
     # writes the data from the member variable data_lines to a file with the given filename
     def write_received_data_to_file(self, filename):
         with open(filename, "w") as file:
@@ -107,6 +257,10 @@ def main():
     print(port.data_lines)
     print("-----Data saved inside the list_of_lists-------")
     print(list_of_lists)
+    # read everything which arrived in the meantime at once:
+    frames, rejected = port.read_batch(number_of_sensors)
+    print("-----Data read in one batch-------")
+    print(frames, "\nrejected lines:", rejected)
     # write the received values from arduino into a file with the given filename
     port.write_received_data_to_file("myport_data.txt")
     # it's important to close the port when no longer needed
@@ -0,0 +1,228 @@
+import os
+import time
+import queue
+from threading import Thread, Lock
+
+import numpy as np
+
+
+class Recorder(Thread):
+    """
+    Writes frames to a csv file while they arrive instead of keeping them
+    in memory till the end, a crash only loses the frames which are not
+    flushed yet. The frames are handed over through a bounded queue to a
+    background thread which writes them in chunks of about chunk_size bytes.
+    The file has the same layout as MyPort.write_received_data_to_file
+    produces, so it can be read with myfile.read_data_from_file!
+    --------------------------------------------------------------------
+    fmt: format of a single value, e.g. "%d" for raw arduino values
+    queue_size: maximum number of pending write calls
+    drop_when_full: if True frames are dropped (and counted) when the queue
+                    is full, otherwise the caller waits till there is space
+    chunk_size: bytes which are collected before they get written
+    flush_interval: after at most flush_interval seconds pending data is
+                    written and the file is flushed
+    fsync: additionally call os.fsync on every flush
+    max_bytes, max_seconds: start a new file (data.txt -> data_1.txt, ...)
+                            when the current file would get bigger than
+                            about max_bytes or is older than max_seconds
+    If writing fails (e.g. the disk is full) the error is raised by the
+    next write call and by stop, the thread keeps emptying the queue so
+    nobody waits forever for space in it!
+    """
+    def __init__(self, filename, fmt="%d", queue_size=1024, drop_when_full=False,
+                 chunk_size=65536, flush_interval=1.0, fsync=False,
+                 max_bytes=None, max_seconds=None):
+        Thread.__init__(self, daemon=True)
+        self.filename = filename
+        self.fmt = fmt
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.drop_when_full = drop_when_full
+        # a chunk is never split, so it must not be bigger than a file:
+        self.chunk_size = min(chunk_size, max_bytes) if max_bytes else chunk_size
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+        self.max_bytes = max_bytes
+        self.max_seconds = max_seconds
+
+        self.file = None
+        self.file_bytes = 0
+        self.file_opened = 0
+        self.filenames = []  # all files written so far
+        self.bytes_written = 0
+        self.dropped = 0
+        # the exception which ended the writing:
+        self.error = None
+        # to calculate bytes/s between two calls of stats:
+        self.stats_lock = Lock()
+        self.last_stats_time = time.time()
+        self.last_stats_bytes = 0
+
+    def write(self, frames):
+        """
+        Queues a numpy array of shape (n_frames, n_values) for writing or a
+        list of frames which may have different numbers of values!
+        """
+        if len(frames) > 0:
+            self.put(frames)
+
+    def write_block(self, block):
+        """Queues complete csv lines (bytes, each ending with a line break) for writing"""
+        if block:
+            self.put(block)
+
+    def write_line(self, line):
+        """Queues a single csv line (without line break) for writing"""
+        self.put(line)
+
+    def put(self, item):
+        if self.error is not None:
+            raise self.error
+        if self.drop_when_full:
+            try:
+                self.queue.put_nowait(item)
+            except queue.Full:
+                self.count_dropped(item)
+        else:
+            self.queue.put(item)
+
+    def count_dropped(self, item):
+        if isinstance(item, bytes):
+            self.dropped += item.count(b"\n")
+        else:
+            self.dropped += 1 if isinstance(item, str) else len(item)
+
+    def stop(self):
+        """
+        Writes all pending frames, closes the file and ends the thread,
+        raises the error if writing failed!
+        """
+        self.queue.put(None)
+        self.join()
+        if self.error is not None:
+            raise self.error
+
+    def stats(self):
+        """
+        Returns a dict with the number of pending write calls (queue_depth),
+        the bytes written so far and the bytes/s since the last call,
+        if queue_depth keeps growing the disk doesn't keep up!
+        """
+        with self.stats_lock:
+            now = time.time()
+            bytes_written = self.bytes_written
+            rate = (bytes_written - self.last_stats_bytes) / max(now - self.last_stats_time, 1e-9)
+            self.last_stats_time = now
+            self.last_stats_bytes = bytes_written
+        return {"queue_depth": self.queue.qsize(),
+                "bytes_written": bytes_written,
+                "bytes_per_second": rate,
+                "dropped": self.dropped,
+                "files": len(self.filenames)}
+
+    def format(self, item):
+        if isinstance(item, str):
+            return item + "\n"
+        if isinstance(item, bytes):
+            return item.decode("ascii")
+        if isinstance(item, list):
+            return "".join([",".join([self.fmt] * len(frame)) % tuple(frame) + "\n" for frame in item])
+        frames = np.atleast_2d(item)
+        line_fmt = ",".join([self.fmt] * frames.shape[1]) + "\n"
+        return "".join([line_fmt % tuple(frame) for frame in frames.tolist()])
+
+    def next_filename(self):
+        if not self.filenames:
+            return self.filename
+        root, ext = os.path.splitext(self.filename)
+        return f"{root}_{len(self.filenames)}{ext}"
+
+    def open_file(self):
+        filename = self.next_filename()
+        self.file = open(filename, "wb")
+        self.filenames.append(filename)
+        self.file_bytes = 0
+        self.file_opened = time.time()
+
+    def close_file(self):
+        self.flush()
+        self.file.close()
+
+    def flush(self):
+        self.file.flush()
+        if self.fsync:
+            os.fsync(self.file.fileno())
+
+    def write_chunk(self, chunk):
+        if self.file_bytes > 0:
+            too_big = self.max_bytes and self.file_bytes + len(chunk) > self.max_bytes
+            too_old = self.max_seconds and time.time() - self.file_opened > self.max_seconds
+            if too_big or too_old:
+                self.close_file()
+                self.open_file()
+        self.file.write(chunk)
+        self.file_bytes += len(chunk)
+        with self.stats_lock:
+            self.bytes_written += len(chunk)
+
+    def run(self):
+        try:
+            self.record()
+        except Exception as error:
+            self.error = error
+            try:
+                self.file.close()
+            except (AttributeError, OSError):
+                pass  # not opened or the data can't be written either
+            # the producers may wait for space in the queue, so it's emptied till stop:
+            item = self.queue.get()
+            while item is not None:
+                self.count_dropped(item)
+                item = self.queue.get()
+
+    def record(self):
+        self.open_file()
+        chunk = []
+        chunk_bytes = 0
+        last_flush = time.time()
+        running = True
+        while running:
+            try:
+                item = self.queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                item = False  # nothing arrived, but we still want to flush
+            if item is None:
+                running = False
+            elif item is not False:
+                data = self.format(item).encode("ascii")
+                chunk.append(data)
+                chunk_bytes += len(data)
+            flush_due = time.time() - last_flush >= self.flush_interval
+            if chunk and (chunk_bytes >= self.chunk_size or flush_due or not running):
+                self.write_chunk(b"".join(chunk))
+                chunk = []
+                chunk_bytes = 0
+            if flush_due:
+                self.flush()
+                last_flush = time.time()
+        self.close_file()
+
+
+def main():
+    """
+    This is an example of how to use this module!
+    """
+    recorder = Recorder("recorder_data.txt", max_bytes=4096)
+    recorder.start()
+    for i in range(100):
+        frames = np.random.randint(0, 1024, size=(10, 8))
+        recorder.write(frames)
+    recorder.write_line("863,840,862,884,779,583,838,925")
+    print(recorder.stats())
+    recorder.stop()
+    print("written files:", recorder.filenames)
+    print(recorder.stats())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+from mylib.myio.mybuffer import ChannelBuffer
+from mylib.myio.mymulti import PortReader
+
+
+class AcquisitionSource(PortReader):
+    """
+    Reads frames in a background thread (a PortReader) so a slow device or
+    a garbage line never blocks the GUI: source is a MyPort (read with
+    read_batch or read_frames in binary mode) or a function returning a
+    numpy array of frames (or a tuple (frames, rejected) like read_batch).
+    The frames are collected till the consumer takes all of them at once
+    with drain (or update/update_bars), at most capacity frames are kept,
+    older ones are dropped and counted in self.dropped.
+    Can be passed as update_func to the mygraph module's plot functions!
+    """
+    def __init__(self, source, n_channels, capacity=100000):
+        PortReader.__init__(self, source, n_channels, capacity)
+
+    def drain(self):
+        """
+        Returns all frames which arrived since the last call as numpy array
+        of shape (n_frames, n_channels), without waiting for the device!
+        Raises the error if the device can't be read anymore.
+        """
+        return self.take()[1]
+
+    def update(self, list_of_lists):
+        """
+        Appends all new frames to list_of_lists e.g: [[], [], []] (only the
+        first len(list_of_lists) channels) or to a ChannelBuffer,
+        returns the number of new frames!
+        """
+        frames = self.drain()
+        if isinstance(list_of_lists, ChannelBuffer):
+            list_of_lists.append(frames)
+        else:
+            # there may be more lists than channels:
+            for i in range(min(len(list_of_lists), frames.shape[1])):
+                list_of_lists[i].extend(frames[:, i].tolist())
+        return len(frames)
+
+    def update_bars(self, a_list, number_of_bars):
+        """
+        Sets a_list to the newest frame (like MyPort.read_csv_for_bar) if
+        something arrived, returns True in this case!
+        """
+        frames = self.drain()
+        if len(frames) == 0:
+            return False
+        a_list[:number_of_bars] = frames[-1, :number_of_bars].tolist()
+        return True
+
+
+def main():
+    """
+    This is an example of how to use this module with a simulated arduino!
+    """
+    import time
+    from mylib.myio.myport import MyPort
+    from mylib.myio.mydevice import SimulatedArduino
+
+    device = SimulatedArduino(rate=200)
+    device.start()
+    port = MyPort(device.port_name, baudrate=115200)
+    source = AcquisitionSource(port, 8)
+    source.start()
+    for _ in range(3):
+        # the consumer can be as slow as it wants, nothing gets lost:
+        time.sleep(0.5)
+        print(source.drain().shape, "frames since the last drain")
+    source.stop()
+    port.close()
+    device.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+import numpy as np
+
+
+def bucket_edges(n, n_buckets):
+    """Returns the n_buckets + 1 start/end indices of n samples split into n_buckets"""
+    return np.linspace(0, n, n_buckets + 1).astype(np.int64)
+
+
+def minmax_decimate(x, y, n_buckets):
+    """
+    Splits the samples into n_buckets (e.g. one per pixel of the axes width)
+    and keeps the minimum and the maximum of each bucket in their original
+    order, so spikes stay visible however many samples are thrown away!
+    NaNs are ignored, a bucket with only NaNs gives NaN (a gap in the line).
+    --------------------------------------------------------------------
+    Returns the decimated x and y arrays with at most 2 * n_buckets values!
+    """
+    x, y = np.asarray(x), np.asarray(y)
+    n = len(y)
+    n_buckets = max(n_buckets, 1)
+    if n <= 2 * n_buckets:
+        return x, y
+    edges = bucket_edges(n, n_buckets)
+    size = int(np.max(np.diff(edges)))
+    # pad every bucket to the same size with its first value to reshape:
+    index = edges[:-1, None] + np.arange(size)
+    index = np.where(index < edges[1:, None], index, edges[:-1, None])
+    buckets = y[index]
+    if buckets.dtype.kind == "f":
+        # nanargmin/nanargmax raise for buckets with only NaNs, these pick
+        # their first sample instead which is NaN:
+        nan = np.isnan(buckets)
+        lo = np.argmin(np.where(nan, np.inf, buckets), axis=1)
+        hi = np.argmax(np.where(nan, -np.inf, buckets), axis=1)
+    else:
+        lo, hi = np.argmin(buckets, axis=1), np.argmax(buckets, axis=1)
+    lo = index[np.arange(n_buckets), lo]
+    hi = index[np.arange(n_buckets), hi]
+    keep = np.sort(np.stack((lo, hi), axis=1), axis=1).ravel()
+    return x[keep], y[keep]
+
+
+def lttb_decimate(x, y, n_out):
+    """
+    Largest Triangle Three Buckets: keeps the first and last sample and of
+    each of the n_out - 2 buckets in between the sample which spans the
+    largest triangle with the sample kept before and the mean of the next
+    bucket, which looks closer to the original line than min/max for
+    smooth signals. The loop runs once per bucket, the samples of a bucket
+    are handled at once.
+    --------------------------------------------------------------------
+    Returns the decimated x and y arrays with n_out (at least 3) values!
+    """
+    x, y = np.asarray(x, dtype=np.float64), np.asarray(y, dtype=np.float64)
+    n = len(y)
+    n_out = max(n_out, 3)
+    if n <= n_out:
+        return x, y
+    edges = bucket_edges(n - 2, n_out - 2) + 1
+    # the means of the buckets, the last sample is the "bucket" after the last:
+    sums_x = np.add.reduceat(x[1:-1], edges[:-1] - 1)
+    sums_y = np.add.reduceat(y[1:-1], edges[:-1] - 1)
+    counts = np.diff(edges)
+    mean_x = np.append(sums_x / counts, x[-1])
+    mean_y = np.append(sums_y / counts, y[-1])
+
+    keep = np.empty(n_out, dtype=np.int64)
+    keep[0], keep[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        bx, by = x[start:end], y[start:end]
+        # twice the area of the triangles (a, b, mean of the next bucket):
+        area = np.abs((x[a] - mean_x[i + 1]) * (by - y[a]) - (x[a] - bx) * (mean_y[i + 1] - y[a]))
+        a = start + int(np.argmax(area))
+        keep[i + 1] = a
+    return x[keep], y[keep]
+
+
+# fewer points can't be drawn as a line, e.g. for a collapsed axes:
+MIN_POINTS = 4
+
+DECIMATORS = {"minmax": lambda x, y, n: minmax_decimate(x, y, n // 2),
+              "lttb": lttb_decimate}
+
+
+def decimate(x, y, n_points, method="minmax"):
+    """
+    Reduces x and y to at most n_points (but at least MIN_POINTS) values
+    with method "minmax" or "lttb"!
+    """
+    n_points = max(n_points, MIN_POINTS)
+    if len(x) <= n_points:
+        return x, y
+    return DECIMATORS[method](x, y, n_points)
+
+
+def main():
+    """
+    This is an example of how to use this module!
+    """
+    x = np.arange(1000000)
+    y = np.sin(x / 50000) * 400 + 500
+    y[123456] = 1023  # a spike
+    for method in DECIMATORS:
+        dx, dy = decimate(x, y, 2000, method)
+        print(method, len(dx), "points, max:", dy.max())
+
+
+if __name__ == '__main__':
+    main()
@@ -1,36 +1,104 @@
+import numpy as np
 from matplotlib import pyplot as plt
 import matplotlib.animation as animation
+from matplotlib.collections import PolyCollection, LineCollection
 
+from mylib.myio.mybuffer import ChannelBuffer
+from mylib.myio.mysource import AcquisitionSource
+from mylib.myplot.mydecimate import decimate as decimate_line
 
-def plot_data(list_of_lists, label):
+
+def use_source(update_func, fig, bars=False):
+    """
+    If update_func is an AcquisitionSource its thread is started (if not yet
+    running) and stopped when the figure gets closed, then each animation
+    tick takes all frames which arrived since the last tick without waiting.
+    --------------------------------------------------------------------
+    Returns the function which should be called every tick!
+    """
+    if not isinstance(update_func, AcquisitionSource):
+        return update_func
+    source = update_func
+    if not source.is_alive():
+        source.start()
+        fig.canvas.mpl_connect("close_event", lambda _: source.stop())
+    return source.update_bars if bars else source.update
+
+
+def plot_data(list_of_lists, label, decimate=None, max_points=None):
     """
     Plots the data in the list_of_lists e.g: [[], [], []]
     then 3 lines will be plotted labled as: label0, label1, label2
+    For long recordings use decimate="minmax" (keeps spikes) or "lttb", then
+    at most max_points (default: 2 per pixel of the axes width) are drawn
+    per line and the visible part is decimated again from the full data
+    after zooming or panning!
     """
     fig = plt.figure()
     ax = plt.subplot(1, 1, 1)
     ax.clear()
-    for i, a_list in enumerate(list_of_lists):
-        ax.plot(a_list, label=f"{label}{i}")
+    if decimate is None:
+        for i, a_list in enumerate(list_of_lists):
+            ax.plot(a_list, label=f"{label}{i}")
+        plt.legend(loc="upper left")
+        plt.show()
+        return
+
+    if max_points is None:
+        max_points = 2 * int(ax.bbox.width)
+    data = [np.asarray(a_list, dtype=np.float64) for a_list in list_of_lists]
+    xs = [np.arange(len(y)) for y in data]
+    lines = [ax.plot(*decimate_line(x, y, max_points, decimate), label=f"{label}{i}")[0]
+             for i, (x, y) in enumerate(zip(xs, data))]
     plt.legend(loc="upper left")
+
+    def redecimate(ax):
+        lo, hi = ax.get_xlim()
+        for line, x, y in zip(lines, xs, data):
+            # one more sample on each side so the line reaches the border:
+            start = max(int(np.searchsorted(x, lo)) - 1, 0)
+            end = int(np.searchsorted(x, hi)) + 1
+            line.set_data(*decimate_line(x[start:end], y[start:end], max_points, decimate))
+        fig.canvas.draw_idle()
+
+    ax.callbacks.connect("xlim_changed", redecimate)
     plt.show()
 
 
-def plot_real_time_data(list_of_lists, update_func, label, interval):
+def plot_real_time_data(list_of_lists, update_func, label, interval,
+                        window=None, rate=None, ylim=None, rescale_every=25, blit=True):
     """
     Update the list_of_lists with the update_func every interval ms and
     then plot the new list_of_lists with the labels: label0, label1...
+    Instead of a list_of_lists a ChannelBuffer from the mybuffer module can be
+    used (e.g. with MyPort.read_into as update_func), then the frames kept
+    in the ChannelBuffer are plotted and the memory stays bounded!
+    If update_func is an AcquisitionSource from the mysource module the
+    device is read in the background and every update takes all frames
+    which arrived since the last one, a slow device doesn't block the plot!
+    If window is given only the last window samples are plotted, see
+    plot_real_time_window, the cost of an update doesn't grow over time then!
     """
+    if window is not None:
+        plot_real_time_window(list_of_lists, update_func, label, interval,
+                              window, rate, ylim, rescale_every, blit)
+        return
     fig = plt.figure()
     ax = plt.subplot(1, 1, 1)
+    update_func = use_source(update_func, fig)
 
     def redraw(_, list_of_lists, update_func, label, ax):
         # update the list_of_lists
         update_func(list_of_lists)
         ax.clear()
         # plot the whole data from list_of_lists on a the cleared graph
-        for i, data_list in enumerate(list_of_lists):
-            ax.plot(data_list, label=f"{label}{i}")
+        if isinstance(list_of_lists, ChannelBuffer):
+            x = list_of_lists.indices()
+            for i in range(list_of_lists.n_channels):
+                ax.plot(x, list_of_lists.channel(i), label=f"{label}{i}")
+        else:
+            for i, data_list in enumerate(list_of_lists):
+                ax.plot(data_list, label=f"{label}{i}")
         plt.legend(loc="upper left")  # fix the label pos or it will jump around
 
     # calls the redraw function with fargs as arguments every interval ms:
@@ -41,15 +109,89 @@ def plot_real_time_data(list_of_lists, update_func, label, interval):
     plt.show()
 
 
-def real_time_data_bar_chart(update_func, nob, label, interval, min=0, max=1023):
+def last_values(list_of_lists, n):
+    """Returns a list with the last (at most) n values of each line"""
+    if isinstance(list_of_lists, ChannelBuffer):
+        return list_of_lists.last(n).T
+    return [data_list[-n:] for data_list in list_of_lists]
+
+
+def plot_real_time_window(list_of_lists, update_func, label, interval,
+                          window, rate=None, ylim=None, rescale_every=25, blit=True):
+    """
+    Like plot_real_time_data but only the last window samples are shown (or
+    the last window seconds if the sample rate in samples per second is given),
+    the x axis shows how long ago a sample was received, 0 is the newest.
+    The lines are created once and only their data is replaced from
+    preallocated arrays, the y axis is fixed if ylim e.g: (0, 1023) is given,
+    otherwise it is rescaled to the visible data every rescale_every updates,
+    with blit only the lines are drawn on a cached background of the axes.
+    So an update costs the same no matter how long the session runs!
+    """
+    n = int(window * rate) if rate else int(window)
+    n_lines = (list_of_lists.n_channels if isinstance(list_of_lists, ChannelBuffer)
+               else len(list_of_lists))
+    x = (np.arange(n) - n + 1) / (rate or 1)
+    # the lines are right aligned, nan values aren't drawn:
+    y = np.full((n_lines, n), np.nan)
+
+    fig = plt.figure()
+    ax = plt.subplot(1, 1, 1)
+    update_func = use_source(update_func, fig)
+    lines = [ax.plot(x, y[i], label=f"{label}{i}", animated=blit)[0] for i in range(n_lines)]
+    ax.set_xlim(x[0], 0)
+    ax.set_xlabel("seconds" if rate else "samples")
+    if ylim is not None:
+        ax.set_ylim(*ylim)
+    plt.legend(loc="upper left")
+    updates = [0]
+
+    def rescale():
+        lo, hi = np.nanmin(y), np.nanmax(y)
+        margin = 0.05 * (hi - lo) or 1
+        limits = (lo - margin, hi + margin)
+        if limits != ax.get_ylim():
+            ax.set_ylim(*limits)
+            if blit:
+                # new tick labels, the cached background gets replaced:
+                fig.canvas.draw()
+
+    def update(_):
+        update_func(list_of_lists)
+        for i, values in enumerate(last_values(list_of_lists, n)):
+            k = len(values)
+            y[i, :n - k] = np.nan
+            y[i, n - k:] = values
+            lines[i].set_ydata(y[i])
+        if ylim is None and updates[0] % rescale_every == 0 and not np.all(np.isnan(y)):
+            rescale()
+        updates[0] += 1
+        return lines
+
+    # calls the update function every interval ms:
+    ani = animation.FuncAnimation(fig, update, interval=interval, blit=blit,
+                                  cache_frame_data=False)
+    plt.show()
+
+
+def real_time_data_bar_chart(update_func, nob, label, interval, min=0, max=1023,
+                             fast=False, peak_hold=None):
     """
     The update_func should take a list as argument which will be updated, the
     format: [bar0, bar1,... bar(nob-1)] with nob ... number of bars
     The bars are labeled like: label0, label1,...
-    We call the update_func every interval ms and update the bar heights
+    We call the update_func every interval ms and update the bar heights,
+    update_func can also be an AcquisitionSource which reads in the background
+    (then the bars show the newest frame of each tick)!
+    With fast=True (or peak_hold) see fast_real_time_data_bar_chart, for many
+    bars and short intervals!
     """
+    if fast or peak_hold:
+        fast_real_time_data_bar_chart(update_func, nob, label, interval, min, max, peak_hold)
+        return
     a_list = [0 for _ in range(nob)]
     fig = plt.figure()
+    update_func = use_source(update_func, fig, bars=True)
     bars = plt.bar([x + 1 for x in range(nob)], a_list, align="center", width=0.3,
                    tick_label=[f"{label}{x}" for x in range(nob)])
     plt.ylim(min, max)
@@ -69,6 +211,62 @@ def real_time_data_bar_chart(update_func, nob, label, interval, min=0, max=1023)
     plt.show()
 
 
+def fast_real_time_data_bar_chart(update_func, nob, label, interval, min=0, max=1023,
+                                  peak_hold=None):
+    """
+    Same as real_time_data_bar_chart but all bars are a single collection
+    whose corners are updated at once from a numpy array, the axes, ticks
+    and labels are drawn once and cached, every interval only the bars are
+    blitted onto this background.
+    If peak_hold is a number of updates, a marker above each bar shows the
+    highest value of the last peak_hold updates (updated in the same pass).
+    """
+    a_list = [0 for _ in range(nob)]
+    fig = plt.figure()
+    ax = plt.subplot(1, 1, 1)
+    update_func = use_source(update_func, fig, bars=True)
+    x = np.arange(1, nob + 1)
+    width = 0.3
+    # the 4 corners of each bar, only the y values of the top corners change:
+    corners = np.empty((nob, 4, 2))
+    corners[:, :, 0] = x[:, None] + np.array([-0.5, -0.5, 0.5, 0.5]) * width
+    corners[:, :, 1] = min
+    bars = PolyCollection(corners, animated=True)
+    ax.add_collection(bars)
+    ax.set_xlim(0.5, nob + 0.5)
+    ax.set_ylim(min, max)
+    # set_xticks(ticks, labels) needs matplotlib >= 3.5:
+    ax.set_xticks(x)
+    ax.set_xticklabels([f"{label}{i}" for i in range(nob)])
+    artists = [bars]
+
+    if peak_hold:
+        segments = corners[:, 1:3].copy()
+        peaks = LineCollection(segments, colors="red", linewidths=2, animated=True)
+        ax.add_collection(peaks)
+        artists.append(peaks)
+        # the heights of the last peak_hold updates:
+        recent = np.full((peak_hold, nob), float(min))
+    updates = [0]
+
+    def update(_):
+        update_func(a_list, nob)
+        heights = np.asarray(a_list, dtype=np.float64)
+        corners[:, 1:3, 1] = heights[:, None]
+        bars.set_verts(corners)
+        if peak_hold:
+            recent[updates[0] % peak_hold] = heights
+            segments[:, :, 1] = recent.max(axis=0)[:, None]
+            peaks.set_segments(segments)
+        updates[0] += 1
+        return artists
+
+    # calls the update function every interval ms:
+    ani = animation.FuncAnimation(fig, update, interval=interval, blit=True,
+                                  cache_frame_data=False)
+    plt.show()
+
+
 def main():
     """
     This is an example of how to use this module, the update function in an real
@@ -84,12 +282,21 @@ def main():
     nob = 8  # number of bars
     real_time_data_bar_chart(get_fake_data_for_bars, nob, "sensor", 200)
 
+    # many bars with a short interval, the red markers show the peaks of the last second:
+    nob = 64
+    real_time_data_bar_chart(get_fake_data_for_bars, nob, "", 30, peak_hold=33)
+
     data = [[1, 2, 3, 7, 8, 15, 2],
             [1, 10, 3, 10, 8, 19, 2],
             [4, 2, 7, 7, 8, 10, 2]]
 
     plot_data(data, "sensor")
 
+    # a long recording, only about 2 points per pixel are drawn:
+    x = np.arange(2000000)
+    data = [np.sin(x / 1e5) * 400 + 500 + np.random.randn(len(x)) * 20]
+    plot_data(data, "sensor", decimate="minmax")
+
     def get_fake_data_for_plot(list_of_lists):
         for a_list in list_of_lists:
             a_list.append(int(random.randrange(0, 900, 10)))
@@ -98,6 +305,11 @@ def main():
     data = [[] for _ in range(0, number_of_sensors)]
     plot_real_time_data(data, get_fake_data_for_plot, "sensor", 200)
 
+    # only the last 10 seconds (5 samples per second), redraws stay fast:
+    data = [[] for _ in range(0, number_of_sensors)]
+    plot_real_time_data(data, get_fake_data_for_plot, "sensor", 200,
+                        window=10, rate=5, ylim=(0, 900))
+
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,69 @@
+"""---If the libary is in a different folder we need to use the sys module---"""
+import sys, os
+# insert at 1, 0 is the script path:
+sys.path.insert(1, os.path.dirname(sys.path[0]))
+
+"""---------Benchmark of the csv loaders in myfile------------"""
+import time
+import tracemalloc
+import argparse
+import numpy as np
+import mylib.myio.myfile as mf
+
+
+def write_synthetic_file(filename, rows, n_channels=8, block_rows=1000000):
+    """Writes rows lines of random arduino like values (0 - 1023) as csv"""
+    with open(filename, "w") as file:
+        for first in range(0, rows, block_rows):
+            n = min(block_rows, rows - first)
+            values = np.random.randint(0, 1024, size=(n, n_channels))
+            np.savetxt(file, values, fmt="%d", delimiter=",")
+
+
+def measure(name, function, memory):
+    if memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    result = function()
+    duration = time.perf_counter() - start
+    line = f"{name:<45} {duration:8.2f} s"
+    if memory:
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        line += f" {peak / 2**20:10.1f} MB peak"
+    print(line)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=10000000)
+    parser.add_argument("--channels", type=int, default=8)
+    parser.add_argument("--file", default="benchmark_data.txt")
+    parser.add_argument("--memory", action="store_true",
+                        help="measure peak memory with tracemalloc (slower)")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.file):
+        print(f"writing {args.rows} rows to {args.file}...")
+        write_synthetic_file(args.file, args.rows, args.channels)
+    print(f"file size: {os.path.getsize(args.file) / 2**20:.1f} MB")
+
+    measure("read_data_from_file (all columns)",
+            lambda: mf.read_data_from_file(args.file, size=args.channels), args.memory)
+    measure("load_data_from_file (all columns)",
+            lambda: mf.load_data_from_file(args.file), args.memory)
+    measure("load_data_from_file (columns 0 and 3)",
+            lambda: mf.load_data_from_file(args.file, columns=[0, 3]), args.memory)
+
+    def column_sums():
+        # streaming: only one block is in memory at a time
+        sums = np.zeros(args.channels)
+        for chunk in mf.iter_data_from_file(args.file):
+            sums += chunk.sum(axis=0)
+        return sums
+    measure("iter_data_from_file (sum of each column)", column_sums, args.memory)
+
+
+if __name__ == '__main__':
+    main()
@@ -5,11 +5,16 @@ sys.path.insert(1, "C:/Users/Luki/Documents/GitHub/ReadSensorValues/python")
 
 """--------------Bar chart and MyPort example------------------"""
 import mylib.myio.myport as mp
+import mylib.myio.mysource as ms
 import mylib.myplot.mygraph as mg
 
 
 port = mp.MyPort("COM5", baudrate=19200) # open a serial connection to arduino uno
 print(port) # look at the properties of the connection
+# print a health summary (frames/s, garbage lines,...) every 5 seconds:
+port.metrics.log = print
 nob = 8 # nob ... number of bars
-mg.real_time_data_bar_chart(port.read_csv_for_bar, nob, "sensor", 80)
+# read the port in the background, the bars show the newest values every 80ms:
+source = ms.AcquisitionSource(port, nob)
+mg.real_time_data_bar_chart(source, nob, "sensor", 80)
 port.close() # close the port!
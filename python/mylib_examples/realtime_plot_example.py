@@ -6,24 +6,30 @@ sys.path.insert(1, "C:/Users/Luki/Documents/GitHub/ReadSensorValues/python")
 """----------Line plot and MyPort example---------------"""
 import mylib.myio.myport as mp
 import mylib.myio.myfile as mf
+import mylib.myio.mybuffer as mb
+import mylib.myio.mysource as ms
 import mylib.myplot.mygraph as mg
 
 # open a serial connection to arduino uno
 port = mp.MyPort("COM5", baudrate=19200)
 # look at the properties of the connection
 print(port)
+# print a health summary (frames/s, garbage lines,...) every 5 seconds:
+port.metrics.log = print
 
 # how much sensors should be read from:
 number_of_sensors = 6
-# now let's plot the incoming data of the arduino in real time
-data = [[] for _ in range(0, number_of_sensors)]
-# here we use the MyPort.read_csv function as our update function
-# which will be called every 200ms and the graph is update in the same pace!
-mg.plot_real_time_data(data, port.read_csv, "sensor", 80)
-
-ans = input("Want to save the recorded data? (yes/no): ")
-if "YES" in ans.upper():
-    port.write_received_data_to_file("data.txt")
+# now let's plot the incoming data of the arduino in real time,
+# the last 10000 frames are kept in a ring buffer so memory stays bounded:
+history = mb.ChannelBuffer(number_of_sensors, 10000)
+# everything we receive is written to data.txt while it arrives:
+port.start_recording("data.txt")
+# the port is read in a background thread, every 80ms the graph takes
+# all frames which arrived in the meantime (so a slow line doesn't block it),
+# only the last 500 frames are drawn so the updates stay fast:
+source = ms.AcquisitionSource(port, number_of_sensors)
+mg.plot_real_time_data(history, source, "sensor", 80, window=500, ylim=(0, 1023))
+print("Recording stats:", port.stop_recording())
 
 ans = input("Want to plot the saved data? (yes/no): ")
 if "YES" in ans.upper():